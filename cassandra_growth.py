@@ -1,41 +1,58 @@
 #!/usr/bin/env python3
 import subprocess
 import re
+import os
+import matplotlib
+if not os.environ.get("DISPLAY"):
+    matplotlib.use("Agg")  # без GUI-бэкенда PNG рисуется быстрее
 import matplotlib.pyplot as plt
-import time
+
+# Упрощение путей ускоряет отрисовку плотных линий при savefig
+matplotlib.rcParams.update({
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+})
 import sys
 
 CONTAINER_ID = "b9d6dc985663"
 KEYSPACE = "test_space"
 TABLE = "messages"
 
-def docker_nodetool_stats(command_args):
-    """Выполняет nodetool внутри Docker-контейнера"""
-    cmd = ['docker', 'exec', CONTAINER_ID] + command_args
+# Прекомпилированные паттерны nodetool tablestats
+_SPACE_RE = re.compile(r'Space used \(live\):\s*([\d.]+)\s*([KMGT]?)B?')
+_PART_RE = re.compile(r'Number of partitions \(estimate\):\s*([\d,]+)')
+_SSTABLE_RE = re.compile(r'SSTable count:\s*(\d+)')
+_MEMT_RE = re.compile(r'Memtable data size:\s*([\d,]+)')
+_MULTIPLIERS = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+SECTION_MARKER = '---SECTION---'
+
+def docker_sh(script):
+    """Выполняет bash-скрипт одним docker exec внутри контейнера"""
+    cmd = ['docker', 'exec', CONTAINER_ID, 'bash', '-c', script]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=30)
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=120)
         return result.stdout
     except subprocess.CalledProcessError as e:
         print(f"Ошибка nodetool: {e.stderr}")
         return None
 
-def get_table_stats():
-    """Получает статистику таблицы из nodetool в Docker"""
-    output = docker_nodetool_stats(['nodetool', 'tablestats', f'{KEYSPACE}.{TABLE}'])
+def parse_table_stats(output):
+    """Парсит статистику таблицы из вывода nodetool tablestats"""
     if not output:
         return {'space_kb': 0, 'partitions': 0, 'sstables': 0, 'memtable_kb': 0}
 
     # Парсим ключевые метрики
-    space_live = re.search(r'Space used \(live\):\s*([\d.]+)\s*([KMGT]?)B?', output)
-    partitions = re.search(r'Number of partitions \(estimate\):\s*([\d,]+)', output)
-    sstables = re.search(r'SSTable count:\s*(\d+)', output)
-    memtable_size = re.search(r'Memtable data size:\s*([\d,]+)', output)
+    space_live = _SPACE_RE.search(output)
+    partitions = _PART_RE.search(output)
+    sstables = _SSTABLE_RE.search(output)
+    memtable_size = _MEMT_RE.search(output)
 
     space_kb = 0
     if space_live:
         num, unit = space_live.groups()
-        multipliers = {'K':1024, 'M':1024**2, 'G':1024**3, 'T':1024**4}
-        space_kb = float(num) * multipliers.get(unit, 1)
+        space_kb = float(num) * _MULTIPLIERS.get(unit, 1)
 
     partitions_num = int(partitions.group(1).replace(',', '')) if partitions else 0
 
@@ -52,9 +69,17 @@ def main():
 
     measurements = []
 
-    # 1. Текущее состояние (memtable)
-    print("📊 1. До flush...")
-    stats1 = get_table_stats()
+    # tablestats до flush, flush и tablestats после — одним docker exec
+    print("📊 1-2. tablestats + flush + tablestats (один docker exec)...")
+    script = (f"nodetool tablestats {KEYSPACE}.{TABLE}; "
+              f"echo '{SECTION_MARKER}'; "
+              f"nodetool flush {KEYSPACE}.{TABLE}; "
+              f"sleep 3; "  # Ждём SSTable
+              f"nodetool tablestats {KEYSPACE}.{TABLE}")
+    output = docker_sh(script)
+    before, _, after = (output or '').partition(SECTION_MARKER)
+
+    stats1 = parse_table_stats(before)
     measurements.append({
         'records': stats1['partitions'],
         'disk_kb': stats1['space_kb'],
@@ -63,12 +88,7 @@ def main():
     })
     print(f"   Записей: {stats1['partitions']:,} | Диск: {stats1['space_kb']/1024:.1f} MB | Memtable: {stats1['memtable_kb']} KB")
 
-    # 2. Flush в Docker
-    print("\n🔄 2. Выполняем flush...")
-    docker_nodetool_stats(['nodetool', 'flush', f'{KEYSPACE}.{TABLE}'])
-    time.sleep(3)  # Ждём SSTable
-
-    stats2 = get_table_stats()
+    stats2 = parse_table_stats(after)
     measurements.append({
         'records': stats2['partitions'],
         'disk_kb': stats2['space_kb'],
@@ -127,7 +147,8 @@ def main():
 
     plt.tight_layout()
     plt.savefig('cassandra_docker_growth.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    if os.environ.get("DISPLAY"):
+        plt.show()
 
     # Итоги
     print(f"\n✅ График: cassandra_docker_growth.png")
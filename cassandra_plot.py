@@ -1,20 +1,46 @@
 #!/usr/bin/env python3
-import pandas as pd
+import os
+import math
+import argparse
+from functools import lru_cache
+
+import types
+
+import matplotlib
+if not os.environ.get("DISPLAY"):
+    matplotlib.use("Agg")  # без GUI-бэкенда PNG рисуется быстрее
 import matplotlib.pyplot as plt
+
+# Упрощение путей ускоряет отрисовку плотных линий при savefig
+matplotlib.rcParams.update({
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+})
 import numpy as np
-import argparse
+
+
+@lru_cache(maxsize=8)
+def _forecast_range(target):
+    """Лог-сетка прогноза от 1000 до target (кэшируется по target)"""
+    return np.logspace(3, math.log10(target), 100)
 
 
 def load_data(csv_file):
     """Загружает данные из CSV: records,disk_kb"""
     try:
-        df = pd.read_csv(csv_file, names=['records', 'disk_kb'], header=None)
-        df['bytes_per_record'] = df['disk_kb'] / df['records'].replace(0, np.nan)
-        df = df.dropna().sort_values('records')
-        return df
+        data = np.loadtxt(csv_file, delimiter=',', dtype=np.float64, ndmin=2)
     except FileNotFoundError:
         print(f"❌ Файл {csv_file} не найден")
         return None
+    records, disk_kb = data[:, 0], data[:, 1]
+    bytes_per_record = disk_kb / np.where(records == 0, np.nan, records)
+    mask = np.isfinite(bytes_per_record)
+    order = np.argsort(records[mask])
+    return types.SimpleNamespace(
+        records=records[mask][order],
+        disk_kb=disk_kb[mask][order],
+        bytes_per_record=bytes_per_record[mask][order])
 
 
 def plot_growth(df, forecast_records):
@@ -22,10 +48,10 @@ def plot_growth(df, forecast_records):
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
 
     # График 1: Записи vs Размер
-    ax1.scatter(df['records'], df['disk_kb']/1024, s=200, alpha=0.8, color='darkblue')
-    z = np.polyfit(df['records'], df['disk_kb'], 1)
+    ax1.scatter(df.records, df.disk_kb/1024, s=200, alpha=0.8, color='darkblue', rasterized=True)
+    z = np.polyfit(df.records, df.disk_kb, 1)
     p = np.poly1d(z)
-    ax1.plot(df['records'], p(df['records']), "r--", linewidth=3, alpha=0.9)
+    ax1.plot(df.records, p(df.records), "r--", linewidth=3, alpha=0.9)
 
     ax1.set_xlabel('Количество записей')
     ax1.set_ylabel('Размер (MB)')
@@ -33,26 +59,28 @@ def plot_growth(df, forecast_records):
     ax1.grid(True, alpha=0.3)
 
     # График 2: Байт на запись
-    ax2.plot(df['records'], df['bytes_per_record'], 'go-', linewidth=3, markersize=12)
-    ax2.axhline(y=df['bytes_per_record'].iloc[-1], color='red', linestyle=':', alpha=0.7)
+    ax2.plot(df.records, df.bytes_per_record, 'go-', linewidth=3, markersize=12)
+    ax2.axhline(y=df.bytes_per_record[-1], color='red', linestyle=':', alpha=0.7)
     ax2.set_xlabel('Количество записей')
     ax2.set_ylabel('Байт на запись')
     ax2.set_title('Эффективность хранения')
     ax2.grid(True, alpha=0.3)
 
     # График 3: Линейная зависимость (zoom)
-    ax3.scatter(df['records'], df['disk_kb']/1024, s=150, color='green', alpha=0.8)
-    ax3.plot(df['records'], p(df['records'])/1024, "r-", linewidth=4)
+    ax3.scatter(df.records, df.disk_kb/1024, s=150, color='green', alpha=0.8, rasterized=True)
+    ax3.plot(df.records, p(df.records)/1024, "r-", linewidth=4)
     ax3.set_xlabel('Количество записей')
     ax3.set_ylabel('Размер (MB)')
     ax3.set_title(f'Регрессия: y = {z[0]:.2e}x + {z[1]:.0f}')
     ax3.grid(True, alpha=0.3)
 
     # График 4: Прогноз (ПАРАМЕТРИЗИРУЕМЫЙ!)
-    bytes_per_record = df['bytes_per_record'].iloc[-1]
-    records_now = df['records'].iloc[-1]
+    bytes_per_record = df.bytes_per_record[-1]
+    # loadtxt читает всё как float64 — приводим счётчик к int, чтобы
+    # подписи не печатали 6,553,600.0
+    records_now = int(df.records[-1])
 
-    forecast_range = np.logspace(np.log10(1000), np.log10(forecast_records), 100)
+    forecast_range = _forecast_range(forecast_records)
 
     # Автоопределение единиц
     if forecast_records >= 1e12:
@@ -71,8 +99,8 @@ def plot_growth(df, forecast_records):
     forecast_size_tb = forecast_range * bytes_per_record / 1024**4
 
     ax4.loglog(forecast_range/scale, forecast_size_tb, 'purple', linewidth=4)
-    ax4.scatter([records_now/scale], [df['disk_kb'].iloc[-1]/1024**4],
-                s=400, color='red', zorder=5, label=f'Сейчас: {records_now:,}')
+    ax4.scatter([records_now/scale], [df.disk_kb[-1]/1024**4],
+                s=400, color='red', zorder=5, label=f'Сейчас: {records_now:,}', rasterized=True)
     ax4.set_xlabel(unit)
     ax4.set_ylabel('Размер (TB)')
     ax4.set_title(f'Прогноз {forecast_records/scale:.0f} {unit[:-12]}\n({bytes_per_record:.0f} байт/запись)')
@@ -81,15 +109,16 @@ def plot_growth(df, forecast_records):
 
     plt.tight_layout()
     plt.savefig('cassandra_growth.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    if os.environ.get("DISPLAY"):
+        plt.show()
 
     # Статистика с ПАРАМЕТРИЗИРУЕМЫМ значением
     print("📊 АНАЛИЗ")
-    print(f"🔢 Записей: {df['records'].iloc[-1]:,}")
-    print(f"💾 Размер: {df['disk_kb'].iloc[-1]/1024:.1f} MB")
-    print(f"📏 Байт/запись: {df['bytes_per_record'].iloc[-1]:.0f}")
-    print(f"🌌 {forecast_records:,} записей: {forecast_records * df['bytes_per_record'].iloc[-1] / 1024**5 :.1f} PB")
-    print(f"📈 Коэффициент регрессии R²: {np.corrcoef(df['records'], df['disk_kb'])[0,1]:.3f}")
+    print(f"🔢 Записей: {records_now:,}")
+    print(f"💾 Размер: {df.disk_kb[-1]/1024:.1f} MB")
+    print(f"📏 Байт/запись: {df.bytes_per_record[-1]:.0f}")
+    print(f"🌌 {forecast_records:,} записей: {forecast_records * df.bytes_per_record[-1] / 1024**5 :.1f} PB")
+    print(f"📈 Коэффициент регрессии R²: {np.corrcoef(df.records, df.disk_kb)[0,1]:.3f}")
 
 
 def main():
@@ -101,7 +130,7 @@ def main():
     args = parser.parse_args()
 
     df = load_data(args.csv)
-    if df is not None and not df.empty:
+    if df is not None and df.records.size:
         plot_growth(df, args.forecast)
     else:
         print("Нет данных для графика")
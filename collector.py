@@ -3,69 +3,104 @@ import subprocess
 import re
 import csv
 import sys
+import argparse
 
 CONTAINER_ID = "b9d6dc985663"
 KEYSPACE = "test_space"
 TABLE = "messages"
 CSV_FILE = "cassandra_stats.csv"
 
-def docker_cqlsh(query):
-    """Выполняет CQL запрос в Docker"""
-    cmd = [
-        'docker', 'exec', CONTAINER_ID, 'cqlsh',
-        '-e', query, 'localhost', '9042'
-    ]
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True,
-                              check=True, timeout=60)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"❌ CQL ошибка: {e.stderr}")
-        return None
-
-def docker_nodetool(command_args):
-    """Выполняет nodetool в Docker"""
-    cmd = ['docker', 'exec', CONTAINER_ID] + command_args
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True,
-                              check=True, timeout=30)
-        return result.stdout
-    except:
-        return None
+# Прекомпилированные паттерны и множители — чтобы не пересобирать на каждый вызов
+_COUNT_RE = re.compile(r'count\s*\|\s*(\d+)')
+_SPACE_RE = re.compile(r'Space used \(live\):\s*([\d.]+)\s*([KMGT]?)B?')
+_PART_RE = re.compile(r'Number of partitions \(estimate\):\s*([\d,]+)')
+_MULTIPLIERS = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+class DockerShell:
+    """Постоянная bash-сессия в контейнере: один docker exec на все команды.
+
+    Каждый docker exec — это fork + attach (~100 мс и более), а запуск cqlsh
+    ещё дороже; при повторном семплировании сессия амортизирует эту цену.
+    """
+
+    def __init__(self, container_id=CONTAINER_ID):
+        self.proc = subprocess.Popen(
+            ['docker', 'exec', '-i', container_id, 'bash'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self._seq = 0
+
+    def run(self, cmd):
+        """Выполняет команду и возвращает её вывод до сентинела"""
+        self._seq += 1
+        sentinel = f'__DONE_{self._seq}__'
+        self.proc.stdin.write(f'{cmd}; echo {sentinel}\n')
+        self.proc.stdin.flush()
+        lines = []
+        for line in self.proc.stdout:
+            if line.strip() == sentinel:
+                break
+            lines.append(line)
+        return ''.join(lines)
+
+    def close(self):
+        if self.proc.stdin:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 def parse_count_result(output):
     """Парсит результат SELECT COUNT(*)"""
-    match = re.search(r'count\s*\|\s*(\d+)', output)
+    match = _COUNT_RE.search(output)
     return int(match.group(1)) if match else 0
 
 def parse_nodetool_stats(output):
-    """Парсит только размер из nodetool tablestats"""
+    """Парсит размер и оценку числа партиций из nodetool tablestats"""
     if not output:
-        return 0
+        return 0, 0
 
-    # Только Space used (live)
-    space_match = re.search(r'Space used \(live\):\s*([\d.]+)\s*([KMGT]?)B?', output)
+    space_match = _SPACE_RE.search(output)
     space_kb = 0
     if space_match:
         num, unit = space_match.groups()
-        multipliers = {'K':1024, 'M':1024**2, 'G':1024**3, 'T':1024**4}
-        space_kb = float(num) * multipliers.get(unit, 1)
+        space_kb = float(num) * _MULTIPLIERS.get(unit, 1)
+
+    part_match = _PART_RE.search(output)
+    partitions = int(part_match.group(1).replace(',', '')) if part_match else 0
 
-    return int(space_kb)
+    return int(space_kb), partitions
 
 def main():
+    parser = argparse.ArgumentParser(description='Сбор статистики таблицы Cassandra')
+    parser.add_argument('--exact', action='store_true',
+                        help='Точный COUNT(*) через cqlsh (полный скан, медленно на больших таблицах)')
+    args = parser.parse_args()
+
     print("📊 Собираем статистику таблицы...")
 
-    # 1. SELECT COUNT(*)
-    print("🔢 Подсчёт записей...")
-    count_result = docker_cqlsh(f"SELECT COUNT(*) FROM {KEYSPACE}.{TABLE};")
-    records = parse_count_result(count_result) if count_result else 0
-    print(f"   Записей: {records:,}")
+    # Все команды — через одну постоянную bash-сессию в контейнере.
+    # По умолчанию берём оценку партиций из tablestats: COUNT(*) — это
+    # полный скан кластера, на большой таблице он не уложится в таймаут.
+    with DockerShell() as sh:
+        stats_output = sh.run(f"nodetool tablestats {KEYSPACE}.{TABLE}")
+        if args.exact:
+            count_result = sh.run(
+                f"cqlsh -e 'SELECT COUNT(*) FROM {KEYSPACE}.{TABLE};' localhost 9042")
+
+    disk_kb, partitions = parse_nodetool_stats(stats_output)
+
+    if args.exact:
+        records = parse_count_result(count_result) if count_result else 0
+        print(f"   Записей (точно): {records:,}")
+    else:
+        records = partitions
+        print(f"   Записей (оценка партиций): {records:,}")
 
-    # 2. nodetool tablestats (только размер)
-    print("💾 Измеряем размер...")
-    stats_output = docker_nodetool(['nodetool', 'tablestats', f'{KEYSPACE}.{TABLE}'])
-    disk_kb = parse_nodetool_stats(stats_output)
     print(f"   Диск: {disk_kb/1024:.1f} MB")
 
     # Сохраняем в CSV: только records,disk_kb
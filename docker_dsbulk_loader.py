@@ -4,26 +4,163 @@
 Исправленный скрипт для загрузки через DSBulk в Docker
 """
 
+import contextlib
+import io
 import subprocess
-import tempfile
 import csv
 import re
 import os
 import time
+from functools import lru_cache
+from multiprocessing import Pool
+
+# Токенизатор значений VALUES(...): строка в кавычках | список | "голое" значение.
+# Один проход finditer в C вместо посимвольного цикла в интерпретаторе.
+_VALUE_RE = re.compile(
+    r"\s*(?:'((?:[^'\\]|\\.|'')*)'|(\[[^\]]*\])|([^,]+?))\s*(?:,|$)",
+    re.DOTALL)
+_BACKSLASH_RE = re.compile(r'\\(.)')
+
+# Паттерн INSERT-запроса и размер чанка для потокового чтения SQL файла
+_INSERT_RE = re.compile(
+    r'INSERT INTO Messages\s*\((.*?)\)\s*VALUES\s*\((.*?)\);',
+    re.DOTALL | re.IGNORECASE)
+_SQL_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _iter_sql_slabs(f):
+    """Потоково выдает куски SQL файла по ~4 MiB, оканчивающиеся на ';'.
+
+    Хвост после последней ';' переносится в следующий кусок, поэтому пиковая
+    память O(chunk_size), а не O(file_size), и ни один INSERT не режется.
+    """
+    tail = ''
+    while True:
+        chunk = f.read(_SQL_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf = tail + chunk
+        last_semi = buf.rfind(';')
+        if last_semi == -1:
+            tail = buf
+            continue
+        yield buf[:last_semi + 1]
+        tail = buf[last_semi + 1:]
+    if tail:
+        yield tail
+
+
+def _iter_inserts(f):
+    """Потоково выдает (columns, values_str) из SQL файла"""
+    for slab in _iter_sql_slabs(f):
+        for m in _INSERT_RE.finditer(slab):
+            yield m.group(1), m.group(2)
+
+
+def _parse_values(values_str):
+    """Парсит строку значений SQL в список для CSV"""
+    values = [_clean_match(m) for m in _VALUE_RE.finditer(values_str)]
+
+    # Проверяем количество значений
+    if len(values) != 15:
+        print(f"Предупреждение: ожидается 15 значений, получено {len(values)}")
+        print(f"Строка: {values_str[:100]}...")
+
+    return values
+
+
+def _parse_slab(slab):
+    """Воркер: парсит все INSERT в куске SQL (выполняется в отдельном процессе)"""
+    return [_parse_values(m.group(2)) for m in _INSERT_RE.finditer(slab)]
+
+
+# Файлы меньше этого порога парсим в одном процессе — Pool не окупается
+_PARALLEL_THRESHOLD = 32 * 1024 * 1024
+
+
+def _is_simple_row(row):
+    """True, если ни одно поле не требует CSV-квотирования"""
+    for field in row:
+        if ',' in field or '"' in field or '\n' in field:
+            return False
+    return True
+
+
+def clean_value(value):
+    """Очищает значение от SQL-форматирования"""
+    if not value:
+        return ''
+
+    # Диспетчеризация по первому символу — один upper() и только когда нужен
+    first = value[0]
+    if first in 'TtFfNn':
+        upper = value.upper()
+        if upper == 'TRUE':
+            return 'true'
+        if upper == 'FALSE':
+            return 'false'
+        if upper == 'NULL':
+            return ''
+        return value
+
+    # Строка в кавычках: снимаем кавычки и разэкранируем ''
+    if first == "'" and value.endswith("'"):
+        return value[1:-1].replace("''", "'")
+
+    # Числа и списки оставляем как есть (Cassandra поймет)
+    return value
+
+
+def _clean_match(m):
+    """Превращает один токен _VALUE_RE в готовое CSV-значение"""
+    quoted, lst, bare = m.groups()
+    if quoted is not None:
+        # Убираем экранирование: \x -> x, '' -> '
+        return _BACKSLASH_RE.sub(r'\1', quoted).replace("''", "'")
+    if lst is not None:
+        return lst
+    return clean_value(bare.strip())
+
+
+@lru_cache(maxsize=None)
+def _docker_cp(container_name, local_file, container_path, mtime, size):
+    """Копирует файл в контейнер; кэшируется по (файл, mtime, размер).
+
+    Неудача поднимает исключение: lru_cache исключения не запоминает,
+    так что временный сбой docker cp (контейнер ещё стартует и т.п.)
+    не застревает в кэше до конца процесса.
+    """
+    cmd = f"docker cp {local_file} {container_name}:{container_path}"
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"docker cp failed: {cmd}")
+    return f"{container_path}{os.path.basename(local_file)}"
+
 
 class DockerDSBulkLoader:
     def __init__(self, container_name="cassandra", keyspace="test_space"):
         self.container_name = container_name
         self.keyspace = keyspace
+        # Путь к DSBulk определяем один раз, а не в каждом shell-скрипте
+        self.dsbulk_path = self._find_dsbulk()
+
+    def _find_dsbulk(self):
+        """Один раз находит бинарь DSBulk в контейнере"""
+        cmd = (f"docker exec {self.container_name} bash -c "
+               f"'ls /tmp/dsbulk-*/bin/dsbulk /opt/dsbulk-*/bin/dsbulk "
+               f"$(which dsbulk 2>/dev/null) 2>/dev/null | head -1'")
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        return result.stdout.strip() or "dsbulk"
 
     def copy_to_container(self, local_file, container_path="/tmp/"):
-        """Копирует файл в контейнер"""
-        cmd = f"docker cp {local_file} {self.container_name}:{container_path}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Ошибка копирования: {result.stderr}")
+        """Копирует файл в контейнер (повторный вызов для того же файла бесплатен)"""
+        st = os.stat(local_file)
+        try:
+            return _docker_cp(self.container_name, local_file, container_path,
+                              st.st_mtime_ns, st.st_size)
+        except RuntimeError as e:
+            print(f"Ошибка копирования: {e}")
             return None
-        return f"{container_path}{os.path.basename(local_file)}"
 
     def install_dsbulk(self):
         """Устанавливает DSBulk в контейнер если нет"""
@@ -46,20 +183,24 @@ class DockerDSBulkLoader:
                 return False
         return True
 
-    def convert_sql_to_csv(self, sql_file_path, csv_file_path):
-        """Конвертирует SQL файл в CSV"""
-        print("Чтение SQL файла...")
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+    def convert_sql_to_csv(self, sql_file_path, csv_out):
+        """Конвертирует SQL файл в CSV потоково, без загрузки файла в память.
 
-        print("Парсинг INSERT запросов...")
-        # Находим все INSERT запросы
-        pattern = r'INSERT INTO Messages\s*\((.*?)\)\s*VALUES\s*\((.*?)\);'
-        inserts = re.findall(pattern, content, re.DOTALL | re.IGNORECASE)
+        csv_out — путь к файлу или уже открытый текстовый файловый объект
+        (например, stdin процесса docker exec tee).
+        """
+        print("Потоковый парсинг INSERT запросов...")
 
-        print(f"Найдено {len(inserts)} INSERT запросов")
+        processed = 0
+        parallel = os.path.getsize(sql_file_path) >= _PARALLEL_THRESHOLD
 
-        with open(csv_file_path, 'w', encoding='utf-8', newline='') as f:
+        if isinstance(csv_out, (str, os.PathLike)):
+            csv_cm = open(csv_out, 'w', encoding='utf-8', newline='',
+                          buffering=1 << 20)
+        else:
+            csv_cm = contextlib.nullcontext(csv_out)
+
+        with open(sql_file_path, 'r', encoding='utf-8') as sql_f, csv_cm as f:
             writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
 
             # Заголовок
@@ -70,127 +211,62 @@ class DockerDSBulkLoader:
                 'deleted_for_all'
             ])
 
-            processed = 0
-            for columns, values_str in inserts:
-                # Парсим значения
-                values = self.parse_sql_values(values_str)
-                writer.writerow(values)
-
-                processed += 1
-                if processed % 10000 == 0:
-                    print(f"  Обработано {processed} записей")
+            def _write_rows(rows):
+                # Быстрый путь: строки без спецсимволов формируем сами и пишем
+                # пачкой через writelines, csv.writer оставляем для остальных
+                nonlocal processed
+                plain = []
+                for row in rows:
+                    if _is_simple_row(row):
+                        plain.append(','.join(row) + '\r\n')
+                    else:
+                        if plain:
+                            f.writelines(plain)
+                            plain.clear()
+                        writer.writerow(row)
+                    processed += 1
+                    if processed % 100000 == 0:
+                        print(f"  Обработано {processed} записей")
+                if plain:
+                    f.writelines(plain)
+
+            if parallel:
+                # Крупный дамп: парсим куски в пуле процессов, пишем в родителе.
+                # imap сохраняет порядок кусков.
+                print(f"Параллельный парсинг на {os.cpu_count()} ядрах...")
+                with Pool() as pool:
+                    for rows in pool.imap(_parse_slab, _iter_sql_slabs(sql_f),
+                                          chunksize=1):
+                        _write_rows(rows)
+            else:
+                _write_rows(self.parse_sql_values(values_str)
+                            for _, values_str in _iter_inserts(sql_f))
 
-        print(f"✓ CSV файл создан: {csv_file_path}")
-        print(f"  Всего записей: {len(inserts)}")
-        return len(inserts)
+        print(f"✓ CSV создан ({processed} записей)")
+        return processed
 
     def parse_sql_values(self, values_str):
         """Парсит строку значений SQL в список Python"""
-        values = []
-        current = ''
-        in_quotes = False
-        in_list = False
-        escape_next = False
-
-        # Очищаем лишние пробелы и переносы строк
-        values_str = values_str.replace('\n', ' ').strip()
-
-        i = 0
-        while i < len(values_str):
-            char = values_str[i]
-
-            if escape_next:
-                current += char
-                escape_next = False
-            elif char == '\\':
-                escape_next = True
-            elif char == "'" and not in_quotes:
-                in_quotes = True
-            elif char == "'" and in_quotes:
-                # Проверяем, не двойная ли кавычка
-                if i + 1 < len(values_str) and values_str[i + 1] == "'":
-                    current += "'"
-                    i += 1  # Пропускаем следующую кавычку
-                else:
-                    in_quotes = False
-            elif char == '[' and not in_quotes:
-                in_list = True
-                current += char
-            elif char == ']' and in_list:
-                in_list = False
-                current += char
-            elif char == ',' and not in_quotes and not in_list:
-                values.append(self.clean_value(current.strip()))
-                current = ''
-            else:
-                current += char
-
-            i += 1
-
-        # Добавляем последнее значение
-        if current:
-            values.append(self.clean_value(current.strip()))
-
-        # Проверяем количество значений
-        if len(values) != 15:
-            print(f"Предупреждение: ожидается 15 значений, получено {len(values)}")
-            print(f"Строка: {values_str[:100]}...")
-
-        return values
-
-    def clean_value(self, value):
-        """Очищает значение от SQL-форматирования"""
-        if not value:
-            return ''
-
-        # Boolean значения
-        if value.upper() == 'TRUE':
-            return 'true'
-        elif value.upper() == 'FALSE':
-            return 'false'
-
-        # NULL
-        if value.upper() == 'NULL':
-            return ''
-
-        # Строка в кавычках
-        if value.startswith("'") and value.endswith("'"):
-            value = value[1:-1]
-            # Заменяем экранированные кавычки
-            value = value.replace("''", "'")
-
-        # Списки оставляем как есть (Cassandra поймет)
-        if value.startswith('[') and value.endswith(']'):
-            return value
-
-        # Числа оставляем как есть
-        return value
-
-    def load_with_dsbulk(self, csv_file, table="messages"):
-        """Загружает CSV через DSBulk с правильными параметрами"""
-        # Копируем CSV в контейнер
-        print(f"Копируем CSV в контейнер...")
-        container_csv = self.copy_to_container(csv_file)
-        if not container_csv:
-            return False
+        return _parse_values(values_str)
+
+    def load_with_dsbulk(self, csv_file=None, table="messages", container_csv=None):
+        """Загружает CSV через DSBulk с правильными параметрами.
+
+        container_csv — путь внутри контейнера, если CSV уже там;
+        иначе csv_file копируется через docker cp.
+        """
+        if container_csv is None:
+            # Копируем CSV в контейнер
+            print(f"Копируем CSV в контейнер...")
+            container_csv = self.copy_to_container(csv_file)
+            if not container_csv:
+                return False
 
         # Команда для DSBulk с правильными параметрами
         dsbulk_cmd = f"""
 docker exec {self.container_name} bash -c '
-    # Определяем путь к DSBulk
-    if [ -f /tmp/dsbulk-1.11.0/bin/dsbulk ]; then
-        DSBULK=/tmp/dsbulk-1.11.0/bin/dsbulk
-    elif [ -f /opt/dsbulk-1.11.0/bin/dsbulk ]; then
-        DSBULK=/opt/dsbulk-1.11.0/bin/dsbulk
-    else
-        # Пробуем найти в PATH
-        DSBULK=$(which dsbulk 2>/dev/null || echo "dsbulk")
-    fi
-
-    # echo "Используем DSBulk: \$DSBULK"
-
     # Проверяем версию DSBulk
-    dsbulk --version
+    {self.dsbulk_path} --version
 
     echo "Начинаем загрузку..."
     echo "CSV файл: {container_csv}"
@@ -198,7 +274,7 @@ docker exec {self.container_name} bash -c '
     echo "Таблица: {table}"
 
     # Запускаем DSBulk с правильными параметрами
-    time dsbulk load \\
+    time {self.dsbulk_path} load \\
         --url file://{container_csv} \\
         --keyspace {self.keyspace} \\
         --table {table} \\
@@ -243,23 +319,18 @@ docker exec {self.container_name} bash -c '
             print(f"Время выполнения: {elapsed:.2f} сек")
             return False
 
-    def simple_load_with_dsbulk(self, csv_file, table="messages"):
+    def simple_load_with_dsbulk(self, csv_file=None, table="messages", container_csv=None):
         """Простая загрузка с минимальными параметрами"""
-        container_csv = self.copy_to_container(csv_file)
-        if not container_csv:
-            return False
+        if container_csv is None:
+            container_csv = self.copy_to_container(csv_file)
+            if not container_csv:
+                return False
 
         # Минимальная команда для тестирования
         dsbulk_cmd = f"""
 docker exec {self.container_name} bash -c '
-    if [ -f /tmp/dsbulk-1.11.0/bin/dsbulk ]; then
-        DSBULK=/tmp/dsbulk-1.11.0/bin/dsbulk
-    else
-        DSBULK=dsbulk
-    fi
-
     echo "Простая загрузка с минимальными параметрами..."
-    \$DSBULK load \\
+    {self.dsbulk_path} load \\
         --url file://{container_csv} \\
         --keyspace {self.keyspace} \\
         --table {table} \\
@@ -291,44 +362,44 @@ docker exec {self.container_name} bash -c '
         #     print("✗ Не удалось установить DSBulk")
         #     return False
 
-        # Создаем временный CSV файл
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as tmp_csv:
-            csv_file_path = tmp_csv.name
-
+        # Стримим CSV сразу в контейнер — без временного файла и docker cp
+        container_csv = "/tmp/load.csv"
+        print("\n1. Конвертация SQL в CSV (поток прямо в контейнер)...")
+        tee = subprocess.Popen(
+            ['docker', 'exec', '-i', self.container_name, 'tee', container_csv],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+        csv_stream = io.TextIOWrapper(tee.stdin, encoding='utf-8', newline='',
+                                      write_through=False)
         try:
-            # Конвертируем в CSV
-            print("\n1. Конвертация SQL в CSV...")
-            record_count = self.convert_sql_to_csv(sql_file_path, csv_file_path)
-
-            if record_count == 0:
-                print("✗ Нет данных для загрузки")
-                return False
+            record_count = self.convert_sql_to_csv(sql_file_path, csv_stream)
+        finally:
+            csv_stream.close()
+            tee.wait()
 
-            # Загружаем через DSBulk
-            print(f"\n2. Загрузка {record_count:,} записей через DSBulk...")
+        if record_count == 0 or tee.returncode != 0:
+            print("✗ Нет данных для загрузки")
+            return False
 
-            # Сначала пробуем простую загрузку
-            success = self.simple_load_with_dsbulk(csv_file_path, table)
+        # Загружаем через DSBulk
+        print(f"\n2. Загрузка {record_count:,} записей через DSBulk...")
 
-            if not success:
-                print("\nПробуем оптимизированную загрузку...")
-                success = self.load_with_dsbulk(csv_file_path, table)
+        # Сначала пробуем простую загрузку
+        success = self.simple_load_with_dsbulk(table=table, container_csv=container_csv)
 
-            if success:
-                print("\n" + "=" * 60)
-                print("✓ ЗАГРУЗКА УСПЕШНО ЗАВЕРШЕНА!")
-                print("=" * 60)
-            else:
-                print("\n" + "=" * 60)
-                print("✗ ЗАГРУЗКА НЕ УДАЛАСЬ")
-                print("=" * 60)
+        if not success:
+            print("\nПробуем оптимизированную загрузку...")
+            success = self.load_with_dsbulk(table=table, container_csv=container_csv)
 
-            return success
+        if success:
+            print("\n" + "=" * 60)
+            print("✓ ЗАГРУЗКА УСПЕШНО ЗАВЕРШЕНА!")
+            print("=" * 60)
+        else:
+            print("\n" + "=" * 60)
+            print("✗ ЗАГРУЗКА НЕ УДАЛАСЬ")
+            print("=" * 60)
 
-        finally:
-            # Удаляем временный CSV файл
-            if os.path.exists(csv_file_path):
-                os.unlink(csv_file_path)
+        return success
 
 def main():
     import argparse
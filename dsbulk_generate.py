@@ -4,30 +4,143 @@
 """
 
 import argparse
-import random
+import bisect
 import uuid
 import time
 from datetime import datetime, timedelta
-import json
-import hashlib
 import os
 import csv
-from typing import List, Dict, Any
+import queue
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+# Порядок колонок CSV; совпадает с порядком полей generate_message_tuple
+FIELDNAMES = (
+    "chat_id", "bucket", "chat_msg_local_id", "flags", "date",
+    "update_time", "author_id", "text", "kludges", "forwarded",
+    "forwarded_message_ids", "mentions", "marked_users", "ttl",
+    "deleted_for_all"
+)
+
+if HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _gen_numeric(n, seed, chat_lo, chat_hi, user_lo, user_hi,
+                     base_epoch, fixed_chat, ttl_choices):
+        """JIT-ядро числовых колонок батча: один скомпилированный цикл.
+
+        Все целочисленные колонки (chat_id, author_id, flags, date,
+        update_time, ttl) считаются без интерпретатора; fixed_chat < 0
+        означает случайный chat_id.
+        """
+        np.random.seed(seed)
+        chat_ids = np.empty(n, np.int64)
+        author_ids = np.empty(n, np.int64)
+        flags = np.empty(n, np.uint8)
+        dates = np.empty(n, np.int64)
+        update_times = np.empty(n, np.int64)
+        ttls = np.empty(n, np.int64)
+        for i in range(n):
+            if fixed_chat >= 0:
+                chat_ids[i] = fixed_chat
+            else:
+                chat_ids[i] = np.random.randint(chat_lo, chat_hi)
+            author_ids[i] = np.random.randint(user_lo, user_hi)
+
+            f = 0
+            if np.random.random() < 0.8:
+                f |= 1
+            if np.random.random() < 0.1:
+                f |= 2
+            if np.random.random() < 0.02:
+                f |= 4
+            if np.random.random() < 0.15:
+                f |= 8
+            if np.random.random() < 0.3:
+                f |= 16
+            flags[i] = f
+
+            d = (base_epoch
+                 - np.random.randint(0, 3 * 365) * 86400
+                 + np.random.randint(0, 86400))
+            dates[i] = d
+            if np.random.random() < 0.1:
+                d += np.random.randint(60, 3601)
+            update_times[i] = d
+
+            if np.random.random() < 0.05:
+                ttls[i] = ttl_choices[np.random.randint(0, 4)]
+            else:
+                ttls[i] = 0
+        return chat_ids, author_ids, flags, dates, update_times, ttls
 
 class CSVDsbulkGenerator:
-    def __init__(self, seed: int = 42):
-        """Инициализация генератора с сидом для воспроизводимости"""
-        random.seed(seed)
+    # Готовые строки булевых значений: без str(x).lower() на каждую строку
+    _BOOL = ("false", "true")
+
+    # Типы упоминаний и накопленные веса (0.7/0.1/0.1/0.1) для выборки
+    # через bisect/searchsorted без пересчёта кумулятивных сумм
+    _MENTION_TYPES = ('none', 'all', 'online', 'user')
+    _MENTION_CDF = (0.7, 0.8, 0.9)
+    _MENTION_CDF_ARR = np.array(_MENTION_CDF)
+
+    # Пороги и веса битов флагов для векторной упаковки в один байт
+    _FLAG_THRESHOLDS = np.array([0.8, 0.1, 0.02, 0.15, 0.3])
+    _FLAG_BITS = np.array([1, 2, 4, 8, 16], dtype=np.uint8)
+
+    # Типы медиа-вложений для kludges
+    _KLUDGE_TYPES = ('photo', 'video', 'document', 'audio', 'voice', 'sticker')
 
-        # Статистика для правдоподобных данных
-        self.users = list(range(1000, 1000000))  # 1M пользователей
-        self.chats = list(range(1000, 500000))   # 500K чатов
+    # Варианты TTL (секунды) общим массивом для numpy- и numba-путей
+    _TTL_CHOICES = np.array([3600, 86400, 604800, 2592000], dtype=np.int64)
+
+    def __init__(self, seed: int = 42, rich_media: bool = False):
+        """Инициализация генератора с сидом для воспроизводимости"""
+        self._rich_media = rich_media
+        # Единый быстрый PCG64-генератор для всей случайности
+        self.rng = np.random.default_rng(seed)
+        self.base_epoch = int(datetime(2020, 1, 1).timestamp())
+
+        # Диапазоны id вместо материализованных списков: choice по
+        # миллиону PyObject-интов заменяется одним rng.integers
+        self.user_id_range = (1000, 1000000)  # 1M пользователей
+        self.chat_id_range = (1000, 500000)   # 500K чатов
         self.common_words = [
             "привет", "как", "дела", "нормально", "спасибо", "пока", "что", "где",
             "когда", "почему", "сегодня", "завтра", "вчера", "работа", "дом", "друзья",
             "встреча", "совещание", "проект", "задача", "срочно", "важно", "файл", "ссылка"
         ]
 
+        # Пул готовых текстов: RNG и строковые операции амортизируются
+        # один раз на ~10k сообщений вместо вызова на каждое
+        self._text_pool = [self._build_one_text() for _ in range(10000)]
+
+        # Готовые JSON-шаблоны kludges: схема на тип медиа фиксирована,
+        # поэтому json.dumps со сканом словаря на каждую строку не нужен
+        self._kludge_tmpl = {}
+        for mt in self._KLUDGE_TYPES:
+            has_wh = mt in ('photo', 'video')
+            has_dur = mt in ('video', 'audio', 'voice')
+            self._kludge_tmpl[mt] = (
+                '{{"type": "' + mt + '", "id": "{id}", "size": {size}, '
+                '"url": "{url}", '
+                '"width": ' + ('{width}' if has_wh else 'null') + ', '
+                '"height": ' + ('{height}' if has_wh else 'null') + ', '
+                '"duration": ' + ('{duration}' if has_dur else 'null') + '}}')
+
         # Метрики для мониторинга
         self.metrics = {
             'messages_generated': 0,
@@ -37,113 +150,114 @@ class CSVDsbulkGenerator:
             'end_time': None
         }
 
-    def generate_message_id(self, chat_id: int, local_id: int) -> int:
-        """Генерация chat_msg_local_id"""
-        return local_id
+    def _rand(self) -> float:
+        """Равномерное число из [0, 1) от PCG64 (быстрее Mersenne Twister)"""
+        return self.rng.random()
 
-    def generate_bucket(self, message_id: int) -> int:
-        """Вычисление bucket = floor(chat_msg_local_id/1000)"""
-        return message_id // 1000
+    def _randint(self, a: int, b: int) -> int:
+        """Целое из [a, b] включительно, аналог random.randint"""
+        return int(self.rng.integers(a, b + 1))
+
+    def _choice(self, seq):
+        """Случайный элемент последовательности одним вызовом rng"""
+        return seq[int(self.rng.integers(len(seq)))]
 
     def generate_flags(self) -> int:
         """Генерация флагов сообщения"""
         flags = 0
-        if random.random() < 0.8:  # 80% прочитано
+        if self._rand() < 0.8:  # 80% прочитано
             flags |= 1
-        if random.random() < 0.1:  # 10% отредактировано
+        if self._rand() < 0.1:  # 10% отредактировано
             flags |= 2
-        if random.random() < 0.02:  # 2% удалено
+        if self._rand() < 0.02:  # 2% удалено
             flags |= 4
-        if random.random() < 0.15:  # 15% переслано
+        if self._rand() < 0.15:  # 15% переслано
             flags |= 8
-        if random.random() < 0.3:  # 30% ответ
+        if self._rand() < 0.3:  # 30% ответ
             flags |= 16
         return flags
 
     def generate_timestamp(self, base_date: datetime = None) -> int:
         """Генерация timestamp в секундах"""
-        if base_date is None:
-            base_date = datetime(2020, 1, 1)
-
-        # Случайная дата за последние 3 лет
-        days_ago = random.randint(0, 3 * 365)
-        random_date = base_date - timedelta(days=days_ago)
-
-        # Добавляем случайное время
-        random_time = timedelta(
-            hours=random.randint(0, 23),
-            minutes=random.randint(0, 59),
-            seconds=random.randint(0, 59)
-        )
+        if base_date is not None:
+            # Холодная ветка: нестандартная база, считаем через datetime
+            base_epoch = int(base_date.timestamp())
+        else:
+            base_epoch = self.base_epoch
 
-        final_date = random_date + random_time
-        return int(final_date.timestamp())
+        # Случайная дата за последние 3 года + случайное время суток,
+        # целиком целочисленно — без timedelta и mktime на каждое сообщение
+        return (base_epoch
+                - self._randint(0, 3 * 365) * 86400
+                + self._randint(0, 86399))
 
-    def generate_text(self, min_words: int = 1, max_words: int = 2) -> str:
-        """Генерация текста сообщения"""
+    def _build_one_text(self, min_words: int = 1, max_words: int = 2) -> str:
+        """Сборка одного текста сообщения (используется для пула в __init__)"""
         words_count = 1 # = random.randint(min_words, max_words)
 
         words = []
         for _ in range(words_count):
-            word = random.choice(self.common_words)
-            if random.random() < 0.3:
+            word = self._choice(self.common_words)
+            if self._rand() < 0.3:
                 word = word.capitalize()
             words.append(word)
 
         text = ' '.join(words)
-        if random.random() < 0.7:
-            text += random.choice(['.', '!', '?'])
+        if self._rand() < 0.7:
+            text += self._choice('.!?')
 
         return text
 
+    def generate_text(self, min_words: int = 1, max_words: int = 2) -> str:
+        """Генерация текста сообщения: один индекс в готовый пул"""
+        return self._choice(self._text_pool)
+
     def generate_kludges(self) -> str:
-        return ""
         """Генерация kludges (сжатых аттачей)"""
-        kludge_types = ['photo', 'video', 'document', 'audio', 'voice', 'sticker']
-
-        if random.random() < 0.3:  # 30% сообщений с медиа
-            media_type = random.choice(kludge_types)
-            kludge_data = {
-                "type": media_type,
-                "id": str(uuid.uuid4()),
-                "size": random.randint(1024, 50 * 1024 * 1024),
-                "url": f"https://cdn.example.com/{media_type}/{hashlib.md5(str(random.random()).encode()).hexdigest()[:8]}",
-                "width": random.choice([1280, 1920, 2560]) if media_type in ['photo', 'video'] else None,
-                "height": random.choice([720, 1080, 1440]) if media_type in ['photo', 'video'] else None,
-                "duration": random.randint(1, 300) if media_type in ['video', 'audio', 'voice'] else None
-            }
-            return json.dumps(kludge_data, ensure_ascii=False)
+        if not self._rich_media:
+            return ""
+
+        if self._rand() < 0.3:  # 30% сообщений с медиа
+            media_type = self._choice(self._KLUDGE_TYPES)
+            # Лишние kwargs для типов без width/height/duration format
+            # просто игнорирует — в их шаблонах запечён null
+            return self._kludge_tmpl[media_type].format(
+                id=uuid.uuid4(),
+                size=self._randint(1024, 50 * 1024 * 1024),
+                url=f"https://cdn.example.com/{media_type}/{self._randint(0, 2**32 - 1):08x}",
+                width=self._choice((1280, 1920, 2560)),
+                height=self._choice((720, 1080, 1440)),
+                duration=self._randint(1, 300))
 
         return "{}"
 
     def generate_forwarded_message_ids(self) -> str:
         """Генерация списка пересланных сообщений для CSV"""
-        if random.random() < 0.15:  # 15% сообщений пересланы
-            count = random.randint(1, 3)
-            ids = [str(random.randint(1000000, 9999999)) for _ in range(count)]
+        if self._rand() < 0.15:  # 15% сообщений пересланы
+            count = self._randint(1, 3)
+            ids = [str(x) for x in self.rng.integers(1000000, 10000000, size=count)]
             return '[' + ','.join(ids) + ']'
         return '[]'
 
     def generate_mentions(self) -> str:
         """Генерация типа упоминаний"""
-        types = ['none', 'all', 'online', 'user']
-        weights = [0.7, 0.1, 0.1, 0.1]
-
-        return random.choices(types, weights=weights, k=1)[0]
+        return self._MENTION_TYPES[bisect.bisect(self._MENTION_CDF, self._rand())]
 
     def generate_marked_users(self, author_id: int) -> str:
         """Генерация списка упомянутых пользователей для CSV"""
-        if random.random() < 0.2:  # 20% сообщений с упоминаниями
-            available_users = [u for u in random.sample(self.users, 10) if u != author_id]
-            count = random.randint(1, min(5, len(available_users)))
-            users = random.sample(available_users, count)
+        if self._rand() < 0.2:  # 20% сообщений с упоминаниями
+            count = self._randint(1, 5)
+            # Один запасной элемент: отброс совпадения с автором не
+            # уменьшает размер списка
+            users = self.rng.integers(*self.user_id_range, size=count + 1)
+            users = users[users != author_id][:count]
             return '[' + ','.join(str(u) for u in users) + ']'
         return '[]'
 
     def generate_ttl(self) -> int:
         """Генерация TTL (в секундах)"""
-        if random.random() < 0.05:  # 5% сообщений с TTL
-            return random.choice([3600, 86400, 604800, 2592000])
+        if self._rand() < 0.05:  # 5% сообщений с TTL
+            return self._choice((3600, 86400, 604800, 2592000))
         return 0
 
     def escape_csv_value(self, value: Any) -> str:
@@ -176,46 +290,120 @@ class CSVDsbulkGenerator:
                 return f'"{escaped}"'
             return str_value
 
-    def generate_message_row(self, message_idx: int, chat_id: int = None) -> Dict[str, Any]:
-        """Генерация одной строки данных для CSV"""
+    def generate_message_tuple(self, message_idx: int, chat_id: int = None) -> tuple:
+        """Генерация одной строки данных для CSV в порядке FIELDNAMES"""
         if chat_id is None:
-            chat_id = random.choice(self.chats)
+            chat_id = int(self.rng.integers(*self.chat_id_range))
 
-        message_id = self.generate_message_id(chat_id, message_idx)
-        author_id = random.choice(self.users)
+        author_id = int(self.rng.integers(*self.user_id_range))
 
         date = self.generate_timestamp()
         update_time = date
-        if random.random() < 0.1:
-            update_time = date + random.randint(60, 3600)
+        if self._rand() < 0.1:
+            update_time = date + self._randint(60, 3600)
 
         text = self.generate_text()
         kludges = self.generate_kludges()
-        forwarded = random.random() < 0.15  # 15% пересланы
+        forwarded = self._rand() < 0.15  # 15% пересланы
         forwarded_message_ids = self.generate_forwarded_message_ids()
         mentions = self.generate_mentions()
         marked_users = self.generate_marked_users(author_id)
         ttl = self.generate_ttl()
-        deleted_for_all = random.random() < 0.01
+        deleted_for_all = self._rand() < 0.01
         flags = self.generate_flags()
 
-        return {
-            "chat_id": chat_id,
-            "bucket": self.generate_bucket(message_id),
-            "chat_msg_local_id": message_id,
-            "flags": flags,
-            "date": date,
-            "update_time": update_time,
-            "author_id": author_id,
-            "text": self.escape_csv_value(text),
-            "kludges": self.escape_csv_value(kludges),
-            "forwarded": str(forwarded).lower(),
-            "forwarded_message_ids": forwarded_message_ids,
-            "mentions": mentions,
-            "marked_users": marked_users,
-            "ttl": ttl,
-            "deleted_for_all": str(deleted_for_all).lower()
-        }
+        # Значения отдаются сырыми: csv.writer сам экранирует редкие
+        # спецсимволы (актуально только в rich_media-режиме)
+        # id сообщения равен индексу, bucket = floor(id/1000) — инлайн
+        # вместо двух вызовов методов на каждую строку
+        return (chat_id, message_idx // 1000, message_idx, flags,
+                date, update_time, author_id, text, kludges,
+                self._BOOL[forwarded], forwarded_message_ids, mentions,
+                marked_users, ttl, self._BOOL[deleted_for_all])
+
+    def _generate_batch_columns(self, n: int, start_idx: int,
+                                chat_id: int = None) -> tuple:
+        """Генерация батча из n строк колоночно через numpy.
+
+        Вместо ~15 вызовов random.* на сообщение каждая колонка рисуется
+        одним C-вызовом RNG на весь батч; Python остаётся только на редких
+        строковых колонках (текст, списки id).
+        """
+        rng = self.rng
+
+        ids = np.arange(start_idx, start_idx + n)
+        msg_ids = ids.tolist()
+        buckets = (ids // 1000).tolist()
+
+        if HAS_NUMBA:
+            # Числовые колонки одним скомпилированным циклом
+            chat_arr, author_arr, flag_arr, date_arr, upd_arr, ttl_arr = \
+                _gen_numeric(n, int(rng.integers(1 << 31)),
+                             *self.chat_id_range, *self.user_id_range,
+                             self.base_epoch,
+                             -1 if chat_id is None else chat_id,
+                             self._TTL_CHOICES)
+            chat_ids = chat_arr.tolist()
+            author_ids = author_arr.tolist()
+            flags = flag_arr.tolist()
+            dates = date_arr.tolist()
+            update_times = upd_arr.tolist()
+            ttls = ttl_arr.tolist()
+        else:
+            if chat_id is None:
+                chat_ids = rng.integers(*self.chat_id_range, size=n).tolist()
+            else:
+                chat_ids = [chat_id] * n
+
+            author_ids = rng.integers(*self.user_id_range, size=n).tolist()
+
+            # Флаги: 5 порогов одним сравнением, упаковка битов весами
+            flag_bits = rng.random((n, 5)) < self._FLAG_THRESHOLDS
+            flags = (flag_bits * self._FLAG_BITS).sum(
+                axis=1, dtype=np.uint8).tolist()
+
+            # Дата целыми: эпоха - дни*86400 + секунды суток, без datetime
+            dates = (self.base_epoch
+                     - rng.integers(0, 3 * 365, size=n) * 86400
+                     + rng.integers(0, 86400, size=n))
+            update_times = (dates + np.where(
+                rng.random(n) < 0.1, rng.integers(60, 3601, size=n), 0)).tolist()
+            dates = dates.tolist()
+
+            ttls = np.where(
+                rng.random(n) < 0.05,
+                rng.choice(self._TTL_CHOICES, size=n), 0).tolist()
+
+        texts = [self.generate_text() for _ in range(n)]
+        kludges = [''] * n  # generate_kludges сейчас всегда возвращает пустую строку
+
+        fwd_mask = rng.random(n) < 0.15
+        # .tolist() даёт Python-bool: numpy.bool_ не годится как индекс
+        # кортежа _BOOL на NumPy 2.x
+        forwarded = [self._BOOL[m] for m in fwd_mask.tolist()]
+
+        fwd_ids = ['[]'] * n
+        for i in np.flatnonzero(rng.random(n) < 0.15):
+            cnt = int(rng.integers(1, 4))
+            fwd_ids[i] = '[' + ','.join(
+                str(x) for x in rng.integers(1000000, 10000000, size=cnt)) + ']'
+
+        mention_idx = np.searchsorted(self._MENTION_CDF_ARR, rng.random(n),
+                                      side='right')
+        mentions = [self._MENTION_TYPES[i] for i in mention_idx]
+
+        marked = ['[]'] * n
+        for i in np.flatnonzero(rng.random(n) < 0.2):
+            cnt = int(rng.integers(1, 6))
+            users = rng.integers(*self.user_id_range, size=cnt)
+            marked[i] = '[' + ','.join(
+                str(u) for u in users[users != author_ids[i]]) + ']'
+
+        deleted = [self._BOOL[m] for m in (rng.random(n) < 0.01).tolist()]
+
+        return (chat_ids, buckets, msg_ids, flags, dates, update_times,
+                author_ids, texts, kludges, forwarded, fwd_ids,
+                mentions, marked, ttls, deleted)
 
     def generate_csv_file(self, count: int, output_file: str,
                          chunk_size: int = 10000, chat_id: int = None) -> None:
@@ -236,26 +424,21 @@ class CSVDsbulkGenerator:
 
         total_generated = 0
         chunk_count = 0
-
-        # Определяем порядок колонок для CSV
-        fieldnames = [
-            "chat_id", "bucket", "chat_msg_local_id", "flags", "date",
-            "update_time", "author_id", "text", "kludges", "forwarded",
-            "forwarded_message_ids", "mentions", "marked_users", "ttl",
-            "deleted_for_all"
-        ]
+        chars_written = 0
 
         # Открываем файл для записи CSV
         with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
 
             # Записываем заголовок
-            writer.writeheader()
+            writer.writerow(FIELDNAMES)
 
             # Генерация сообщений
             for i in range(count):
-                row = self.generate_message_row(i, chat_id)
-                writer.writerow(row)
+                row = self.generate_message_tuple(i, chat_id)
+                # writerow возвращает число записанных символов — считаем
+                # размер сами: tell() на TextIOWrapper сбрасывает буфер
+                chars_written += writer.writerow(row)
                 total_generated += 1
 
                 # Периодически показываем прогресс
@@ -264,14 +447,10 @@ class CSVDsbulkGenerator:
                     elapsed = time.time() - self.metrics['start_time']
                     rate = total_generated / elapsed if elapsed > 0 else 0
 
-                    # Оцениваем размер файла
-                    current_pos = csvfile.tell()
-                    estimated_total = current_pos * (count / total_generated)
-
                     print(f"  Прогресс: {total_generated:,}/{count:,} "
                           f"({total_generated/count*100:.1f}%), "
                           f"скорость: {rate:.1f} msg/sec, "
-                          f"размер файла: {current_pos/1024/1024:.1f} MB")
+                          f"размер файла: ~{chars_written/1024/1024:.1f} MB")
 
         self.metrics['end_time'] = time.time()
         self.metrics['messages_generated'] = total_generated
@@ -284,104 +463,174 @@ class CSVDsbulkGenerator:
 
     def generate_multiple_csv_files(self, count: int, output_dir: str,
                                    records_per_file: int = 100000,
-                                   chat_id: int = None) -> None:
-        """Генерация нескольких CSV файлов для больших объемов"""
+                                   chat_id: int = None,
+                                   seed: int = 42) -> None:
+        """Генерация нескольких CSV файлов параллельно по процессам.
 
+        Файлы независимы, поэтому каждый получает свой процесс и свой
+        дочерний сид от SeedSequence — результат воспроизводим и
+        масштабируется линейно по ядрам.
+        """
+
+        n_files = count // records_per_file + (1 if count % records_per_file else 0)
         print(f"Генерация {count} сообщений в директорию {output_dir}")
         print(f"Сообщений на файл: {records_per_file}")
-        print(f"Количество файлов: {count // records_per_file + (1 if count % records_per_file else 0)}")
+        print(f"Количество файлов: {n_files}")
 
         # Создаем директорию если не существует
         os.makedirs(output_dir, exist_ok=True)
 
-        total_generated = 0
-        file_count = 0
-
-        # Определяем порядок колонок для CSV
-        fieldnames = [
-            "chat_id", "bucket", "chat_msg_local_id", "flags", "date",
-            "update_time", "author_id", "text", "kludges", "forwarded",
-            "forwarded_message_ids", "mentions", "marked_users", "ttl",
-            "deleted_for_all"
-        ]
-
-        while total_generated < count:
-            file_count += 1
-            records_in_file = min(records_per_file, count - total_generated)
-            output_file = os.path.join(output_dir, f"messages_part_{file_count:04d}.csv")
-
-            print(f"\nГенерация файла {file_count}: {output_file}")
-            print(f"  Записей в файле: {records_in_file}")
-
-            start_time = time.time()
+        # Дочерние сиды: независимые потоки случайности на каждый файл
+        child_seeds = [int(ss.generate_state(1)[0])
+                       for ss in np.random.SeedSequence(seed).spawn(n_files)]
+
+        jobs = []
+        total_planned = 0
+        for file_idx in range(n_files):
+            records_in_file = min(records_per_file, count - total_planned)
+            output_file = os.path.join(
+                output_dir, f"messages_part_{file_idx + 1:04d}.csv")
+            jobs.append((child_seeds[file_idx], total_planned,
+                         records_in_file, chat_id, output_file))
+            total_planned += records_in_file
+
+        with ProcessPoolExecutor() as executor:
+            for output_file, records_in_file, elapsed, file_size in \
+                    executor.map(_generate_one_file, jobs):
+                print(f"  ✓ {output_file}: {file_size/1024/1024:.1f} MB, "
+                      f"{records_in_file} записей, "
+                      f"время: {elapsed:.1f} сек, "
+                      f"скорость: {records_in_file/elapsed:.1f} msg/sec")
 
-            with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+        print(f"\n✓ Все файлы созданы!")
+        print(f"  Всего файлов: {n_files}")
+        print(f"  Всего сообщений: {total_planned}")
+        print(f"  Директория: {output_dir}")
 
-                for i in range(records_in_file):
-                    row = self.generate_message_row(total_generated + i, chat_id)
-                    writer.writerow(row)
+    def generate_sharded_csv(self, count: int, output_dir: str,
+                             shards: int, chat_id: int = None,
+                             seed: int = 42) -> None:
+        """Шардированная генерация: N файлов оптимизированным конвейером.
 
-            elapsed = time.time() - start_time
-            file_size = os.path.getsize(output_file)
+        Каждый шард пишется своим процессом через векторизованный батчевый
+        путь; директорию с шардами DSBulk ест напрямую (-url directory/).
+        """
 
-            print(f"  ✓ Файл создан: {file_size/1024/1024:.1f} MB, "
-                  f"время: {elapsed:.1f} сек, "
-                  f"скорость: {records_in_file/elapsed:.1f} msg/sec")
+        records_per_shard = -(-count // shards)  # ceil
+        print(f"Шардированная генерация {count} сообщений: "
+              f"{shards} шардов по ~{records_per_shard} записей")
 
-            total_generated += records_in_file
+        os.makedirs(output_dir, exist_ok=True)
 
-        print(f"\n✓ Все файлы созданы!")
-        print(f"  Всего файлов: {file_count}")
-        print(f"  Всего сообщений: {total_generated}")
-        print(f"  Директория: {output_dir}")
+        child_seeds = [int(ss.generate_state(1)[0])
+                       for ss in np.random.SeedSequence(seed).spawn(shards)]
+
+        jobs = []
+        planned = 0
+        for shard_idx in range(shards):
+            records = min(records_per_shard, count - planned)
+            if records <= 0:
+                break
+            output_file = os.path.join(
+                output_dir, f"messages_shard_{shard_idx + 1:04d}.csv")
+            jobs.append((child_seeds[shard_idx], planned, records,
+                         chat_id, output_file))
+            planned += records
+
+        workers = min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for output_file, records, elapsed, file_size in \
+                    executor.map(_gen_shard, jobs):
+                print(f"  ✓ {output_file}: {file_size/1024/1024:.1f} MB, "
+                      f"{records} записей, время: {elapsed:.1f} сек, "
+                      f"скорость: {records/elapsed:.1f} msg/sec")
+
+        print(f"\n✓ Все шарды созданы!")
+        print(f"  Всего сообщений: {planned}")
+        print(f"  Загрузка: dsbulk load -url {output_dir}/ -k keyspace -t table")
 
     def generate_optimized_csv(self, count: int, output_file: str,
                               chat_id: int = None,
-                              progress_interval: int = 1000) -> None:
-        """Оптимизированная генерация CSV с буферизацией"""
+                              progress_interval: int = 1000,
+                              start_idx: int = 0) -> None:
+        """Оптимизированная генерация CSV батчами по 10k строк"""
 
         print(f"Оптимизированная генерация {count} сообщений в CSV")
-        print(f"Буферизация записей в памяти")
-
-        BUFFER_SIZE = 1000  # Записей в буфере
-        buffer = []
+        print(f"Векторизованные батчи по 10000 записей")
 
-        # Определяем порядок колонок для CSV
-        fieldnames = [
-            "chat_id", "bucket", "chat_msg_local_id", "flags", "date",
-            "update_time", "author_id", "text", "kludges", "forwarded",
-            "forwarded_message_ids", "mentions", "marked_users", "ttl",
-            "deleted_for_all"
-        ]
+        BATCH_SIZE = 10000  # Записей в батче
 
         start_time = time.time()
 
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for i in range(count):
-                row = self.generate_message_row(i, chat_id)
-                buffer.append(row)
-
-                # Когда буфер заполнен, записываем в файл
-                if len(buffer) >= BUFFER_SIZE:
-                    writer.writerows(buffer)
-                    buffer.clear()
-
-                # Показываем прогресс
-                if (i + 1) % progress_interval == 0:
-                    elapsed = time.time() - start_time
-                    rate = (i + 1) / elapsed
-                    print(f"  Сгенерировано: {i + 1:,}/{count:,} "
-                          f"({(i + 1)/count*100:.1f}%), "
-                          f"скорость: {rate:.1f} msg/sec")
-
-            # Записываем остатки из буфера
-            if buffer:
-                writer.writerows(buffer)
+        FLUSH_SIZE = 1 << 20  # Копим ~1 MiB перед каждым write()
+
+        with open(output_file, 'wb', buffering=1 << 20) as csvfile:
+            # Фоновая запись: write() отпускает GIL, поэтому форматирование
+            # следующего батча перекрывается с уходом предыдущего на диск
+            chunk_q = queue.Queue(maxsize=4)
+
+            def _drain():
+                while True:
+                    chunk = chunk_q.get()
+                    if chunk is None:
+                        break
+                    csvfile.write(chunk)
+
+            writer_thread = threading.Thread(target=_drain)
+            writer_thread.start()
+
+            buf = bytearray((','.join(FIELDNAMES) + '\n').encode())
+
+            generated = 0
+            try:
+                while generated < count:
+                    n = min(BATCH_SIZE, count - generated)
+                    cols = self._generate_batch_columns(n, start_idx + generated, chat_id)
+                    if HAS_PANDAS:
+                        # Кодирование CSV целиком в C через pandas
+                        buf += pd.DataFrame(
+                            dict(zip(FIELDNAMES, cols)), copy=False).to_csv(
+                            header=False, index=False).encode()
+                    else:
+                        str_cols = []
+                        for ci, col in enumerate(cols):
+                            if ci in (7, 10, 12):
+                                # text плюс списковые колонки
+                                # forwarded_message_ids и marked_users:
+                                # '[1,2]' содержит запятые и без кавычек
+                                # сдвигает все последующие поля
+                                col = ['"' + t.replace('"', '""') + '"'
+                                       if (',' in t or '"' in t) else t for t in col]
+                                str_cols.append(col)
+                            elif isinstance(col[0], str):
+                                str_cols.append(col)
+                            else:
+                                str_cols.append(list(map(str, col)))
+                        # Сборка всего батча C-уровневыми join'ами
+                        buf += ('\n'.join(map(','.join, zip(*str_cols)))
+                                + '\n').encode()
+                    if len(buf) >= FLUSH_SIZE:
+                        chunk_q.put(bytes(buf))
+                        buf.clear()
+                    generated += n
+
+                    # Показываем прогресс
+                    if generated % progress_interval < n:
+                        elapsed = time.time() - start_time
+                        rate = generated / elapsed
+                        print(f"  Сгенерировано: {generated:,}/{count:,} "
+                              f"({generated/count*100:.1f}%), "
+                              f"скорость: {rate:.1f} msg/sec")
+
+                # Дописываем остаток буфера
+                if buf:
+                    chunk_q.put(bytes(buf))
+            finally:
+                # Сентинел в finally: иначе упавшая генерация оставляет
+                # non-daemon писателя навсегда в queue.get(), и процесс
+                # виснет на выходе без трейсбека
+                chunk_q.put(None)
+                writer_thread.join()
 
         elapsed = time.time() - start_time
         file_size = os.path.getsize(output_file)
@@ -424,6 +673,38 @@ class CSVDsbulkGenerator:
         print("     dsbulk load -url directory/ -k keyspace -t table")
         print("\n  Подсказка: используйте -dryRun true для тестирования")
 
+def _gen_shard(job: tuple) -> tuple:
+    """Работник пула процессов: один шард оптимизированным конвейером"""
+    seed, start_idx, records, chat_id, output_file = job
+
+    generator = CSVDsbulkGenerator(seed=seed)
+
+    start_time = time.time()
+    generator.generate_optimized_csv(
+        records, output_file, chat_id=chat_id,
+        progress_interval=max(records, 1), start_idx=start_idx)
+    elapsed = time.time() - start_time
+
+    return output_file, records, elapsed, os.path.getsize(output_file)
+
+def _generate_one_file(job: tuple) -> tuple:
+    """Работник пула процессов: генерирует один CSV файл целиком"""
+    seed, start_idx, records_in_file, chat_id, output_file = job
+
+    generator = CSVDsbulkGenerator(seed=seed)
+
+    start_time = time.time()
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES)
+
+        for i in range(records_in_file):
+            writer.writerow(generator.generate_message_tuple(start_idx + i, chat_id))
+
+    elapsed = time.time() - start_time
+    return output_file, records_in_file, elapsed, os.path.getsize(output_file)
+
 def main():
     parser = argparse.ArgumentParser(
         description='Генератор CSV файлов для загрузки в Cassandra через DSBulk'
@@ -444,6 +725,9 @@ def main():
                        help='Частота вывода прогресса')
     parser.add_argument('--optimized', action='store_true',
                        help='Использовать оптимизированный режим с буферизацией')
+    parser.add_argument('--shards', type=int,
+                       help='Число шардов: параллельная генерация N файлов '
+                            'оптимизированным конвейером')
     parser.add_argument('--no-header', action='store_true',
                        help='Не добавлять заголовок в CSV (по умолчанию с заголовком)')
 
@@ -453,13 +737,23 @@ def main():
     generator = CSVDsbulkGenerator(seed=args.seed)
 
     # Выбираем режим генерации
-    if args.output_dir:
+    if args.shards:
+        # Шардированная генерация: N файлов параллельно
+        generator.generate_sharded_csv(
+            count=args.count,
+            output_dir=args.output_dir or 'messages_shards',
+            shards=args.shards,
+            chat_id=args.chat_id,
+            seed=args.seed
+        )
+    elif args.output_dir:
         # Генерация нескольких CSV файлов
         generator.generate_multiple_csv_files(
             count=args.count,
             output_dir=args.output_dir,
             records_per_file=args.records_per_file,
-            chat_id=args.chat_id
+            chat_id=args.chat_id,
+            seed=args.seed
         )
     elif args.optimized:
         # Оптимизированная генерация
@@ -13,22 +13,95 @@ import json
 import hashlib
 import os
 import csv
+from collections import defaultdict
+from multiprocessing import Pool
 from typing import List, Dict, Any, Set
 
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    # Собранное Cython-расширение (cythonize -i _fast_rows.pyx):
+    # строка CSV одним snprintf вместо f-строки и четырёх int-to-str
+    from _fast_rows import format_row as _c_format_row
+    HAS_FAST_ROWS = True
+except ImportError:
+    HAS_FAST_ROWS = False
+
+# Размер пакета предвыборки флагов и идентификаторов
+_FLAG_BATCH = 100_000
+_ID_BATCH = 100_000
+
+# Средняя длина строки CSV в байтах — для оценки размера без tell()
+_AVG_ROW_BYTES = 22
+
+# flags всегда 0..255: готовые строки вместо int-to-str на каждую запись
+_FLAG_STR = tuple(str(i) for i in range(256))
+
+# Пороги битов флагов, квантованные в байт (round(p * 256)): сравнение
+# байта с целым порогом вместо выработки double на каждую монетку
+# p = 0.8, 0.1, 0.02, 0.15, 0.3, 0.05, 0.2, 0.01
+_FLAG_CUTOFFS = np.array([205, 26, 5, 38, 77, 13, 51, 3], dtype=np.uint8)
+_FLAG_WEIGHTS = np.array([1, 2, 4, 8, 16, 32, 64, 128], dtype=np.int64)
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _gen_flags_batch(n, seed):
+        """JIT-пакет флагов: 8 сравнений и битовых OR без диспатча CPython"""
+        np.random.seed(seed)
+        out = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            f = 0
+            if np.random.random() < 0.8:   # прочитано
+                f |= 1
+            if np.random.random() < 0.1:   # отредактировано
+                f |= 2
+            if np.random.random() < 0.02:  # удалено
+                f |= 4
+            if np.random.random() < 0.15:  # переслано
+                f |= 8
+            if np.random.random() < 0.3:   # ответ
+                f |= 16
+            if np.random.random() < 0.05:  # с пометкой
+                f |= 32
+            if np.random.random() < 0.2:   # упоминание
+                f |= 64
+            if np.random.random() < 0.01:  # системное сообщение
+                f |= 128
+            out[i] = f
+        return out
+
 class UserToMessageCSVGenerator:
     def __init__(self, seed: int = 42):
         """Инициализация генератора с сидом для воспроизводимости"""
         random.seed(seed)
+        self.seed = seed
+        # Собственный PCG64-генератор: глобальный np.random не сидируется,
+        # и пакетные выборки через него ломали бы воспроизводимость
+        self.rng = np.random.default_rng(seed)
+
+        # Статистика для правдоподобных данных: диапазоны id вместо
+        # резидентных списков на миллионы упакованных int
+        self.users_lo, self.users_hi = 1000, 1000000  # 1M пользователей
+        self.peers_lo, self.peers_hi = 1000, 500000   # 500K чатов (peer_id)
 
-        # Статистика для правдоподобных данных
-        self.users = list(range(1000, 1000000))  # 1M пользователей
-        self.peers = list(range(1000, 500000))   # 500K чатов (peer_id)
+        # Для отслеживания chat_local_id для каждого (user_id, peer_id):
+        # defaultdict избавляет от парного probe+insert на каждую строку
+        self.chat_local_counter = defaultdict(int)
 
-        # Для отслеживания chat_local_id для каждого (user_id, peer_id)
-        self.chat_local_counter = {}
+        # Пакетный буфер флагов (заполняется JIT-функцией при наличии numba)
+        self._flag_buf = None
+        self._flag_cursor = 0
 
-        # Кэш для уже сгенерированных сообщений (чтобы избежать дубликатов)
-        self.generated_messages = set()
+        # Пакетные буферы user_id/peer_id
+        self._u_buf = None
+        self._p_buf = None
+        self._id_cursor = 0
 
         # Метрики для мониторинга
         self.metrics = {
@@ -41,47 +114,58 @@ class UserToMessageCSVGenerator:
 
     def get_next_chat_local_id(self, user_id: int, peer_id: int) -> int:
         """Получение следующего chat_local_id для пары (user_id, peer_id)"""
-        key = (user_id, peer_id)
-        if key not in self.chat_local_counter:
-            self.chat_local_counter[key] = 0
+        # Упакованный int-ключ: peer_id < 500000 < 2**20, целые хэшируются
+        # заметно быстрее кортежей и не аллоцируются на каждую строку
+        key = (user_id << 20) | peer_id
         self.chat_local_counter[key] += 1
         return self.chat_local_counter[key]
 
+    def _refill_flags(self) -> None:
+        """Пакет флагов на 100k строк одним вызовом: JIT или numpy"""
+        if HAS_NUMBA:
+            self._flag_buf = _gen_flags_batch(
+                _FLAG_BATCH, random.getrandbits(31))
+        else:
+            # Векторная сборка битовой маски: случайные байты против
+            # целых порогов — в 8 раз меньше выхлопа PRNG, чем (N, 8)
+            # double, и сравнения идут по uint8
+            r = self.rng.integers(0, 256, (_FLAG_BATCH, 8), dtype=np.uint8)
+            self._flag_buf = (r < _FLAG_CUTOFFS).astype(np.int64) @ _FLAG_WEIGHTS
+        # Один tolist() конвертирует весь пакет в Python int за C-проход —
+        # без боксинга numpy-скаляра и int() на каждую строку
+        self._flag_buf = self._flag_buf.tolist()
+        self._flag_cursor = 0
+
     def generate_flags(self) -> int:
-        """Генерация флагов сообщения"""
-        flags = 0
-        if random.random() < 0.8:  # 80% прочитано
-            flags |= 1
-        if random.random() < 0.1:  # 10% отредактировано
-            flags |= 2
-        if random.random() < 0.02:  # 2% удалено
-            flags |= 4
-        if random.random() < 0.15:  # 15% переслано
-            flags |= 8
-        if random.random() < 0.3:  # 30% ответ
-            flags |= 16
-        if random.random() < 0.05:  # 5% с пометкой
-            flags |= 32
-        if random.random() < 0.2:  # 20% упоминание
-            flags |= 64
-        if random.random() < 0.01:  # 1% системное сообщение
-            flags |= 128
-        return flags
+        """Генерация флагов сообщения: чтение из предвыбранного пакета"""
+        if self._flag_buf is None or self._flag_cursor >= _FLAG_BATCH:
+            self._refill_flags()
+        i = self._flag_cursor
+        self._flag_cursor = i + 1
+        return self._flag_buf[i]
+
+    def _refill_ids(self) -> None:
+        """Пакетная выборка id: два randint в C вместо random.choice на вызов"""
+        self._u_buf = self.rng.integers(self.users_lo, self.users_hi,
+                                        size=_ID_BATCH).tolist()
+        self._p_buf = self.rng.integers(self.peers_lo, self.peers_hi,
+                                        size=_ID_BATCH).tolist()
+        self._id_cursor = 0
 
     def generate_unique_message_key(self) -> tuple:
         """Генерация уникального ключа сообщения для избежания дубликатов"""
         while True:
-            user_id = random.choice(self.users)
-            peer_id = random.choice(self.peers)
-            key = (user_id, peer_id)
-
-            # Если для этой пары еще нет записей, создаем новую
-            if key not in self.chat_local_counter:
-                return (user_id, peer_id, 1)
-
-            # Иначе проверяем, не превысили ли лимит сообщений для этой пары
-            if self.chat_local_counter[key] < 1000:  # Максимум 1000 сообщений на пару
-                return (user_id, peer_id, self.chat_local_counter[key] + 1)
+            if self._u_buf is None or self._id_cursor >= _ID_BATCH:
+                self._refill_ids()
+            i = self._id_cursor
+            self._id_cursor = i + 1
+            user_id = self._u_buf[i]
+            peer_id = self._p_buf[i]
+            # Один hash-lookup на пару: и новая пара, и пара в пределах
+            # лимита обрабатываются общей веткой
+            cnt = self.chat_local_counter.get((user_id << 20) | peer_id, 0)
+            if cnt < 1000:  # Максимум 1000 сообщений на пару
+                return (user_id, peer_id, cnt + 1)
 
             # Если превысили, ищем другую пару
 
@@ -106,42 +190,81 @@ class UserToMessageCSVGenerator:
                 return f'"{escaped}"'
             return str_value
 
+    def _row_random(self) -> tuple:
+        """Строка со случайной парой (user_id, peer_id)"""
+        user_id, peer_id, chat_local_id = self.generate_unique_message_key()
+        self.chat_local_counter[(user_id << 20) | peer_id] = chat_local_id
+        # Уникальность (user_id, peer_id, chat_local_id) гарантирована
+        # монотонным счётчиком пар — отдельный set всех выданных троек
+        # держал O(N) памяти ради проверки, которая не может сработать.
+        # Плоский кортеж вместо словаря: без аллокации dict на строку
+        return (user_id, peer_id, chat_local_id, self.generate_flags())
+
+    def _make_row_fn(self, user_id: int = None, peer_id: int = None) -> tuple:
+        """Специализация горячего пути под режим генерации.
+
+        Возвращает (row_fn, finish): для фиксированной пары row_fn держит
+        счётчик локальным int без словарного lookup на строку, finish
+        записывает итог обратно в chat_local_counter для сводки.
+        """
+        if user_id is None or peer_id is None:
+            return self._row_random, (lambda: None)
+
+        key = (user_id << 20) | peer_id
+        state = [self.chat_local_counter[key]]
+
+        def _row_fixed():
+            state[0] += 1
+            return (user_id, peer_id, state[0], self.generate_flags())
+
+        def _finish():
+            self.chat_local_counter[key] = state[0]
+
+        return _row_fixed, _finish
+
     def generate_record_row(self, record_idx: int,
                           user_id: int = None,
-                          peer_id: int = None) -> Dict[str, Any]:
-        """Генерация одной строки данных для CSV"""
-
-        # Генерируем или используем переданные user_id и peer_id
+                          peer_id: int = None) -> tuple:
+        """Генерация одной строки данных для CSV (универсальный путь)"""
         if user_id is None or peer_id is None:
-            user_id, peer_id, chat_local_id = self.generate_unique_message_key()
-        else:
-            # Для фиксированных user_id и peer_id генерируем последовательный chat_local_id
-            chat_local_id = self.get_next_chat_local_id(user_id, peer_id)
-
-        # Обновляем счетчик
-        key = (user_id, peer_id)
-        if key not in self.chat_local_counter:
-            self.chat_local_counter[key] = 0
-        self.chat_local_counter[key] = chat_local_id
-
-        flags = self.generate_flags()
-
-        # Уникальный ключ для проверки дубликатов
-        message_key = (user_id, peer_id, chat_local_id)
-        if message_key in self.generated_messages:
-            # Если такой ключ уже есть, увеличиваем chat_local_id
-            chat_local_id += 1
-            self.chat_local_counter[key] = chat_local_id
-            message_key = (user_id, peer_id, chat_local_id)
-
-        self.generated_messages.add(message_key)
-
-        return {
-            "user_id": user_id,
-            "peer_id": peer_id,
-            "chat_local_id": chat_local_id,
-            "flags": flags
-        }
+            return self._row_random()
+        chat_local_id = self.get_next_chat_local_id(user_id, peer_id)
+        return (user_id, peer_id, chat_local_id, self.generate_flags())
+
+    def _emit_rows(self, count: int, user_id: int, peer_id: int,
+                   sink, progress_cb=None,
+                   flush_size: int = 256 * 1024) -> None:
+        """Единый горячий цикл: все режимы записи сходятся сюда.
+
+        Строки копятся байтами и уходят в sink кусками ~flush_size;
+        прогресс отдаётся колбэку не чаще раза в полсекунды. Одна точка
+        для дальнейшей оптимизации (Cython/JIT) вместо трёх копий цикла.
+        """
+        row_fn, finish = self._make_row_fn(user_id, peer_id)
+        row_bytes = _c_format_row if HAS_FAST_ROWS else None
+        buf = bytearray()
+        next_report = time.monotonic() + 0.5
+
+        for i in range(count):
+            u, p, c, fl = row_fn()
+            if row_bytes is not None:
+                buf += row_bytes(u, p, c, fl)
+            else:
+                buf += f"{u},{p},{c},{_FLAG_STR[fl]}\n".encode('ascii')
+
+            if len(buf) >= flush_size:
+                sink(buf)
+                buf.clear()
+
+            if progress_cb is not None:
+                t = time.monotonic()
+                if t >= next_report:
+                    next_report = t + 0.5
+                    progress_cb(i + 1)
+
+        if buf:
+            sink(buf)
+        finish()
 
     def generate_csv_file(self, count: int, output_file: str,
                          chunk_size: int = 10000,
@@ -167,47 +290,22 @@ class UserToMessageCSVGenerator:
                 print("Отменено пользователем")
                 return
 
-        total_generated = 0
-        chunk_count = 0
-
-        # Определяем порядок колонок для CSV (соответствует порядку в таблице)
-        fieldnames = [
-            "user_id",
-            "peer_id",
-            "chat_local_id",
-            "flags"
-        ]
-
-        # Открываем файл для записи CSV
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            # Записываем заголовок
-            writer.writeheader()
-
-            # Генерация записей
-            for i in range(count):
-                row = self.generate_record_row(i, user_id, peer_id)
-                writer.writerow(row)
-                total_generated += 1
-
-                # Периодически показываем прогресс
-                if total_generated % chunk_size == 0:
-                    chunk_count += 1
-                    elapsed = time.time() - self.metrics['start_time']
-                    rate = total_generated / elapsed if elapsed > 0 else 0
-
-                    # Оцениваем размер файла
-                    current_pos = csvfile.tell()
-                    estimated_total = current_pos * (count / total_generated)
-
-                    print(f"  Прогресс: {total_generated:,}/{count:,} "
-                          f"({total_generated/count*100:.1f}%), "
-                          f"скорость: {rate:.1f} records/sec, "
-                          f"размер файла: {current_pos/1024/1024:.1f} MB")
+        def _progress(done):
+            elapsed = time.time() - self.metrics['start_time']
+            rate = done / elapsed if elapsed > 0 else 0
+            est_bytes = done * _AVG_ROW_BYTES
+            print(f"  Прогресс: {done:,}/{count:,} "
+                  f"({done/count*100:.1f}%), "
+                  f"скорость: {rate:.1f} records/sec, "
+                  f"размер файла: ~{est_bytes/1024/1024:.1f} MB")
+
+        with open(output_file, 'wb', buffering=0) as csvfile:
+            csvfile.write(b"user_id,peer_id,chat_local_id,flags\n")
+            self._emit_rows(count, user_id, peer_id,
+                            csvfile.write, _progress)
 
         self.metrics['end_time'] = time.time()
-        self.metrics['records_generated'] = total_generated
+        self.metrics['records_generated'] = count
 
         # Получаем финальный размер файла
         file_size = os.path.getsize(output_file)
@@ -234,47 +332,34 @@ class UserToMessageCSVGenerator:
         # Создаем директорию если не существует
         os.makedirs(output_dir, exist_ok=True)
 
-        total_generated = 0
+        # Файлы независимы — генерируем их пулом процессов; каждый воркер
+        # со своим сидом (seed + номер файла) даёт воспроизводимые и
+        # непересекающиеся потоки. Счётчик пар у каждого воркера свой:
+        # для DSBulk это не важно, все файлы льются в одну таблицу.
+        jobs = []
+        total_planned = 0
         file_count = 0
-
-        # Определяем порядок колонок для CSV
-        fieldnames = [
-            "user_id",
-            "peer_id",
-            "chat_local_id",
-            "flags"
-        ]
-
-        while total_generated < count:
+        while total_planned < count:
             file_count += 1
-            records_in_file = min(records_per_file, count - total_generated)
-            output_file = os.path.join(output_dir, f"usertomessage_part_{file_count:04d}.csv")
+            records_in_file = min(records_per_file, count - total_planned)
+            output_file = os.path.join(
+                output_dir, f"usertomessage_part_{file_count:04d}.csv")
+            jobs.append((self.seed + file_count, records_in_file,
+                         output_file, user_id, peer_id))
+            total_planned += records_in_file
 
-            print(f"\nГенерация файла {file_count}: {output_file}")
-            print(f"  Записей в файле: {records_in_file}")
-
-            start_time = time.time()
-
-            with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-
-                for i in range(records_in_file):
-                    row = self.generate_record_row(total_generated + i, user_id, peer_id)
-                    writer.writerow(row)
-
-            elapsed = time.time() - start_time
-            file_size = os.path.getsize(output_file)
-
-            print(f"  ✓ Файл создан: {file_size/1024/1024:.1f} MB, "
-                  f"время: {elapsed:.1f} сек, "
-                  f"скорость: {records_in_file/elapsed:.1f} records/sec")
-
-            total_generated += records_in_file
+        start_time = time.time()
+        with Pool(min(len(jobs), os.cpu_count() or 1)) as pool:
+            pool.map(_gen_one_part, jobs)
+        elapsed = time.time() - start_time
 
+        total_bytes = sum(os.path.getsize(job[2]) for job in jobs)
         print(f"\n✓ Все файлы созданы!")
         print(f"  Всего файлов: {file_count}")
-        print(f"  Всего записей: {total_generated}")
+        print(f"  Всего записей: {total_planned}")
+        print(f"  Общий размер: {total_bytes/1024/1024:.1f} MB")
+        print(f"  Время: {elapsed:.1f} сек "
+              f"({total_planned/elapsed:.1f} records/sec)")
         print(f"  Директория: {output_dir}")
 
     def generate_optimized_csv(self, count: int, output_file: str,
@@ -292,43 +377,28 @@ class UserToMessageCSVGenerator:
         if peer_id is not None:
             print(f"Фиксированный peer_id: {peer_id}")
 
-        BUFFER_SIZE = 1000  # Записей в буфере
-        buffer = []
-
-        # Определяем порядок колонок для CSV
-        fieldnames = [
-            "user_id",
-            "peer_id",
-            "chat_local_id",
-            "flags"
-        ]
-
         start_time = time.time()
 
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for i in range(count):
-                row = self.generate_record_row(i, user_id, peer_id)
-                buffer.append(row)
-
-                # Когда буфер заполнен, записываем в файл
-                if len(buffer) >= BUFFER_SIZE:
-                    writer.writerows(buffer)
-                    buffer.clear()
-
-                # Показываем прогресс
-                if (i + 1) % progress_interval == 0:
-                    elapsed = time.time() - start_time
-                    rate = (i + 1) / elapsed
-                    print(f"  Сгенерировано: {i + 1:,}/{count:,} "
-                          f"({(i + 1)/count*100:.1f}%), "
-                          f"скорость: {rate:.1f} records/sec")
-
-            # Записываем остатки из буфера
-            if buffer:
-                writer.writerows(buffer)
+        def _progress(done):
+            elapsed = time.time() - start_time
+            print(f"  Сгенерировано: {done:,}/{count:,} "
+                  f"({done/count*100:.1f}%), "
+                  f"скорость: {done/elapsed:.1f} records/sec")
+
+        # Сырой бинарный файл: куски ~256 KB из _emit_rows уходят одним
+        # write() каждый, без TextIOWrapper и его транскодинга
+        with open(output_file, 'wb', buffering=0) as csvfile:
+            # Подсказываем ядру: запись последовательная, write-once —
+            # файл уйдёт в DSBulk, держать его в page cache незачем
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(csvfile.fileno(), 0, 0,
+                                 os.POSIX_FADV_SEQUENTIAL)
+            csvfile.write(b"user_id,peer_id,chat_local_id,flags\n")
+            self._emit_rows(count, user_id, peer_id,
+                            csvfile.write, _progress)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(csvfile.fileno(), 0, 0,
+                                 os.POSIX_FADV_DONTNEED)
 
         elapsed = time.time() - start_time
         file_size = os.path.getsize(output_file)
@@ -383,6 +453,25 @@ class UserToMessageCSVGenerator:
         print("       -maxRecords 500000")
         print("\n  Подсказка: используйте -dryRun true для тестирования конфигурации")
 
+def _gen_one_part(job: tuple) -> str:
+    """Работник пула: генерирует один part-файл со своим генератором"""
+    seed, records, output_file, user_id, peer_id = job
+    generator = UserToMessageCSVGenerator(seed=seed)
+
+    blob = bytearray(b"user_id,peer_id,chat_local_id,flags\n")
+    generator._emit_rows(records, user_id, peer_id, blob.extend)
+
+    fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, blob)
+        # Файлы пишутся один раз: сразу выталкиваем из page cache, чтобы
+        # серия part-файлов не вымывала рабочее множество
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return output_file
+
 def main():
     parser = argparse.ArgumentParser(
         description='Генератор CSV файлов для загрузки в таблицу UserToMessage через DSBulk'
@@ -5,24 +5,116 @@
 """
 
 import argparse
+import mmap
+import queue
 import random
 import string
+import threading
 import time
-from datetime import datetime, timedelta
-import csv
 import os
 import math
 from typing import List, Dict, Any, Tuple
 
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Целые пороги (p * 2^12) для флагов чата: активен 70%, публичный 30%,
+# верифицирован 20%, скрыт 10%, медиа 40%. Пять решений на строку
+# принимаются по одному 64-битному розыгрышу, нарезанному на 12-битные
+# поля (5 x 12 = 60 <= 64 бит), вместо пяти отдельных float-сравнений
+_CHAT_FLAG_T = [int(p * (1 << 12)) for p in (0.7, 0.3, 0.2, 0.1, 0.4)]
+
+# Словарь описаний чатов — модульный кортеж, а не список,
+# пересоздаваемый на каждый вызов generate_description
+_WORDS = (
+    "группа", "обсуждение", "проект", "команда", "работа",
+    "друзья", "семья", "коллеги", "сообщество", "чат",
+    "активный", "полезный", "интересный", "важный", "закрытый",
+    "открытый", "официальный", "неофициальный", "веселый", "серьезный"
+)
+
+# То же для флагов PeerIds: уведомления 80%, админ 50%, создатель 10%,
+# покинул 30%, забанен 20%
+_PEER_FLAG_T = [int(p * (1 << 12)) for p in (0.8, 0.5, 0.1, 0.3, 0.2)]
+
+
+def _flags_from_bits(r, thresholds):
+    """Пять флаговых битов на строку из одного uint64-массива розыгрышей"""
+    flags = np.zeros(len(r), np.int64)
+    for k, t in enumerate(thresholds):
+        field = (r >> np.uint64(12 * k)) & np.uint64(0xFFF)
+        flags |= (field < t).astype(np.int64) << k
+    return flags
+
+if HAS_NUMBA:
+    # cache=True складывает скомпилированный код в __pycache__: полную
+    # JIT-компиляцию (десятки секунд) платит только самый первый запуск
+    # CLI, дальше ядро грузится с диска за миллисекунды. AOT-сборка через
+    # numba.pycc дала бы то же самое, но pycc объявлен устаревшим и
+    # удаляется из numba, так что дисковый кэш — поддерживаемый путь.
+    @njit(cache=True)
+    def _fill_peer_chunk(n, seed, now_ts, chat_ids):
+        """Девять числовых колонок PeerIds одним скомпилированным проходом"""
+        np.random.seed(seed)
+        users = np.empty(n, np.int64)
+        chats = np.empty(n, np.int64)
+        invites = np.empty(n, np.int64)
+        disables = np.empty(n, np.int64)
+        flags = np.empty(n, np.int64)
+        inviters = np.empty(n, np.int64)
+        last_reads = np.empty(n, np.int64)
+        last_msgs = np.empty(n, np.int64)
+        lmts = np.empty(n, np.int64)
+        span = 3 * 365 * 24 * 3600
+        for i in range(n):
+            users[i] = np.random.randint(1000, 1000000)
+            chats[i] = chat_ids[np.random.randint(0, len(chat_ids))]
+            invites[i] = now_ts - np.random.randint(0, span)
+            disables[i] = np.random.randint(0, 101) if np.random.random() < 0.1 else 0
+            f = 0
+            if np.random.random() < 0.8:
+                f |= 1
+            if np.random.random() < 0.5:
+                f |= 2
+            if np.random.random() < 0.1:
+                f |= 4
+            if np.random.random() < 0.3:
+                f |= 8
+            if np.random.random() < 0.2:
+                f |= 16
+            flags[i] = f
+            inviters[i] = np.random.randint(1000, 1000000)
+            last_reads[i] = np.random.randint(0, 10001)
+            last_msgs[i] = np.random.randint(0, 10001)
+            lmts[i] = invites[i] + np.random.randint(0, 180 * 24 * 3600)
+        return (users, chats, invites, disables, flags, inviters,
+                last_reads, last_msgs, lmts)
+
 class CassandraDataGenerator:
     def __init__(self, seed: int = 42):
         """Инициализация генератора с сидом для воспроизводимости"""
         random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+
+        # База для меток времени — одно целое на весь запуск: дальше
+        # достаточно вычитать случайное смещение в секундах
+        self._now_ts = int(time.time())
+
+        # Алфавит для строковых полей одним uint8-массивом: индексы
+        # тянутся из rng целыми чанками, без посимвольного random.choices
+        self._alphabet = np.frombuffer(
+            (string.ascii_letters + string.digits).encode('ascii'), np.uint8)
 
-        # Диапазоны ID
-        self.user_ids = list(range(1000, 1000000))  # 1M пользователей
-        self.chat_ids = list(range(1000, 500000))   # 500K чатов
-        self.message_ids = list(range(1000, 10000000))  # 10M сообщений
+        # Диапазоны ID — плотные интервалы, поэтому храним только границы:
+        # три list(range(...)) на ~11.5M элементов занимали сотни МБ
+        self.users_lo, self.users_hi = 1000, 1000000      # 1M пользователей
+        self.chats_lo, self.chats_hi = 1000, 500000       # 500K чатов
+        self.msgs_lo, self.msgs_hi = 1000, 10000000       # 10M сообщений
 
         # Метрики
         self.metrics = {
@@ -52,14 +144,8 @@ class CassandraDataGenerator:
 
     def generate_description(self, length: int = 100) -> str:
         """Генерация описания чата"""
-        words = [
-            "группа", "обсуждение", "проект", "команда", "работа",
-            "друзья", "семья", "коллеги", "сообщество", "чат",
-            "активный", "полезный", "интересный", "важный", "закрытый",
-            "открытый", "официальный", "неофициальный", "веселый", "серьезный"
-        ]
         word_count = random.randint(5, 15)
-        selected_words = random.choices(words, k=word_count)
+        selected_words = random.choices(_WORDS, k=word_count)
         description = ' '.join(selected_words).capitalize()
 
         # Обрезаем до нужной длины
@@ -70,7 +156,7 @@ class CassandraDataGenerator:
     def generate_pinned_message_ids(self, max_count: int = 3) -> str:
         """Генерация списка закрепленных сообщений"""
         count = random.randint(1, max_count)
-        ids = random.sample(self.message_ids, count)
+        ids = random.sample(range(self.msgs_lo, self.msgs_hi), count)
         return '[' + ','.join(str(msg_id) for msg_id in ids) + ']'
 
     def generate_members_count(self) -> int:
@@ -85,50 +171,28 @@ class CassandraDataGenerator:
 
     def generate_chat_flags(self) -> int:
         """Генерация флагов чата"""
+        # Один getrandbits(64) вместо пяти random.random(): те же пять
+        # решений по 12-битным полям против целых порогов _CHAT_FLAG_T
+        r = random.getrandbits(64)
         flags = 0
-        if random.random() < 0.7:  # 70% чатов активны
-            flags |= 1
-        if random.random() < 0.3:  # 30% чатов публичные
-            flags |= 2
-        if random.random() < 0.2:  # 20% чатов верифицированы
-            flags |= 4
-        if random.random() < 0.1:  # 10% чатов скрыты
-            flags |= 8
-        if random.random() < 0.4:  # 40% чатов разрешают медиа
-            flags |= 16
+        for k, t in enumerate(_CHAT_FLAG_T):
+            if (r >> (12 * k)) & 0xFFF < t:
+                flags |= 1 << k
         return flags
 
     def generate_timestamp(self, years_back: int = 3) -> int:
         """Генерация timestamp в секундах"""
-        base_date = datetime.now()
-
-        # Случайная дата за последние years_back лет
-        days_ago = random.randint(0, years_back * 365)
-        random_date = base_date - timedelta(days=days_ago)
-
-        # Добавляем случайное время
-        random_time = timedelta(
-            hours=random.randint(0, 23),
-            minutes=random.randint(0, 59),
-            seconds=random.randint(0, 59)
-        )
-
-        final_date = random_date - random_time
-        return int(final_date.timestamp())
+        # Целочисленная арифметика вместо datetime/timedelta: результат
+        # всё равно int-секунды, объекты дат были чистыми накладными
+        return self._now_ts - random.randint(0, years_back * 365 * 24 * 3600)
 
     def generate_peer_flags(self) -> int:
         """Генерация флагов для PeerIds"""
+        r = random.getrandbits(64)
         flags = 0
-        if random.random() < 0.8:  # 80% уведомления включены
-            flags |= 1
-        if random.random() < 0.5:  # 50% пользователь администратор
-            flags |= 2
-        if random.random() < 0.1:  # 10% пользователь создатель
-            flags |= 4
-        if random.random() < 0.3:  # 30% пользователь покинул чат
-            flags |= 8
-        if random.random() < 0.2:  # 20% пользователь забанен
-            flags |= 16
+        for k, t in enumerate(_PEER_FLAG_T):
+            if (r >> (12 * k)) & 0xFFF < t:
+                flags |= 1 << k
         return flags
 
     def escape_csv_value(self, value: Any) -> str:
@@ -150,39 +214,83 @@ class CassandraDataGenerator:
             return str(value)
 
     def generate_chat_row(self, chat_id: int, prob_description: float = 0.05,
-                         prob_pinned: float = 0.1) -> Dict[str, Any]:
-        """Генерация строки для таблицы Chats"""
+                         prob_pinned: float = 0.1) -> tuple:
+        """Генерация строки для таблицы Chats (плоский кортеж полей)"""
         has_description = random.random() < prob_description
         has_pinned = random.random() < prob_pinned
 
-        return {
-            "id": chat_id,
-            "name": self.escape_csv_value(self.generate_name()),
-            "pinned_message_ids": self.generate_pinned_message_ids() if has_pinned else "[]",
-            "secret": self.escape_csv_value(self.generate_secret()),
-            "photo": self.escape_csv_value(self.generate_photo()),
-            "members_count": self.generate_members_count(),
-            "description": self.escape_csv_value(self.generate_description()) if has_description else "",
-            "flags": self.generate_chat_flags()
-        }
+        # name/secret/photo состоят из [A-Za-z0-9_] — экранировать нечего;
+        # описание без запятых и кавычек, но с пробелами, квотируем целиком
+        return (
+            chat_id,
+            self.generate_name(),
+            self.generate_pinned_message_ids() if has_pinned else "[]",
+            self.generate_secret(),
+            self.generate_photo(),
+            self.generate_members_count(),
+            f'"{self.generate_description()}"' if has_description else "",
+            self.generate_chat_flags(),
+        )
 
     def generate_peerid_row(self, user_id: int, chat_id: int,
-                          base_timestamp: int) -> Dict[str, Any]:
-        """Генерация строки для таблицы PeerIds"""
+                          base_timestamp: int,
+                          last_message_ts: int = None) -> tuple:
+        """Генерация строки для таблицы PeerIds (плоский кортеж полей)"""
         invite_timestamp = base_timestamp
-        last_message_ts = invite_timestamp + random.randint(0, 30 * 24 * 3600)  # до 30 дней после приглашения
-
-        return {
-            "user_id": user_id,
-            "chat_id": chat_id,
-            "invite_timestamp": invite_timestamp,
-            "disable_for": random.randint(0, 100) if random.random() < 0.1 else 0,
-            "flags": self.generate_peer_flags(),
-            "inviter_id": random.choice(self.user_ids),
-            "last_read_message_id": random.randint(0, 10000),
-            "last_message_id": random.randint(0, 10000),
-            "last_message_ts": last_message_ts
-        }
+        if last_message_ts is None:
+            last_message_ts = invite_timestamp + random.randint(0, 30 * 24 * 3600)  # до 30 дней после приглашения
+
+        return (
+            user_id,
+            chat_id,
+            invite_timestamp,
+            random.randint(0, 100) if random.random() < 0.1 else 0,
+            self.generate_peer_flags(),
+            random.randint(self.users_lo, self.users_hi - 1),
+            random.randint(0, 10000),
+            random.randint(0, 10000),
+            last_message_ts,
+        )
+
+    @staticmethod
+    def _start_writer(csvfile):
+        """Фоновый писатель: пока чанк пишется на диск, основной поток
+        собирает следующий. Очередь ограничена, чтобы не копить
+        закодированные чанки в памяти; None — сигнал завершения."""
+        q = queue.Queue(maxsize=4)
+
+        def _drain():
+            while True:
+                chunk = q.get()
+                if chunk is None:
+                    break
+                csvfile.write(chunk)
+
+        t = threading.Thread(target=_drain, daemon=True)
+        t.start()
+        return q, t
+
+    def _draw_peer_columns(self, n: int, chat_ids: np.ndarray) -> tuple:
+        """Числовые колонки PeerIds на чанк: numba-ядро или чистый numpy"""
+        now_ts = self._now_ts
+        if HAS_NUMBA:
+            seed = int(self.rng.integers(0, 2 ** 31))
+            return _fill_peer_chunk(n, seed, now_ts, chat_ids)
+
+        rng = self.rng
+        invites = now_ts - rng.integers(0, 3 * 365 * 24 * 3600, n)
+        return (
+            rng.integers(1000, 1000000, n),
+            chat_ids[rng.integers(0, len(chat_ids), n)],
+            invites,
+            np.where(rng.random(n) < 0.1, rng.integers(0, 101, n), 0),
+            _flags_from_bits(
+                rng.integers(0, 1 << 64, n, dtype=np.uint64), _PEER_FLAG_T),
+            rng.integers(1000, 1000000, n),
+            rng.integers(0, 10001, n),
+            rng.integers(0, 10001, n),
+            invites + rng.integers(0, 180 * 24 * 3600, n),
+        )
 
     def generate_chats_csv(self, count: int, output_file: str,
                           prob_description: float = 0.05,
@@ -201,23 +309,98 @@ class CassandraDataGenerator:
                 return []
 
         generated_chat_ids = []
-        fieldnames = ["id", "name", "pinned_message_ids", "secret", "photo",
-                     "members_count", "description", "flags"]
-
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
 
-            for i in range(count):
-                chat_id = self.chat_ids[i] if i < len(self.chat_ids) else 1000 + i
-                row = self.generate_chat_row(chat_id, prob_description, prob_pinned)
-                writer.writerow(row)
-                generated_chat_ids.append(chat_id)
-
-                if (i + 1) % chunk_size == 0:
-                    elapsed = time.time() - self.metrics['start_time']
-                    rate = (i + 1) / elapsed if elapsed > 0 else 0
-                    print(f"  Чатов: {i + 1:,}/{count:,} ({rate:.1f} chats/sec)")
+        # Файл преаллоцируется ftruncate с запасом (потолок байт на строку)
+        # и заполняется через mmap: страницы уходят на диск в обход
+        # файлового буфера, в конце файл обрезается до фактического
+        # размера. Вариант с фиксированной шириной строк и параллельной
+        # записью по смещениям отброшен: файл раздувается в ~1.5-2 раза,
+        # а DSBulk пришлось бы кормить хвостовыми пробелами.
+        # pinned_message_ids содержит запятые, поэтому поле всегда в
+        # кавычках (DictWriter квотировал его автоматически).
+        header = (b"id,name,pinned_message_ids,secret,photo,"
+                  b"members_count,description,flags\n")
+        row_cap = 192  # верхняя граница: описание <= 100 байт + кавычки
+        fd = os.open(output_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+        try:
+            os.ftruncate(fd, len(header) + count * row_cap)
+            mm = mmap.mmap(fd, len(header) + count * row_cap)
+            mm.write(header)
+            wq, writer = self._start_writer(mm)
+
+            # Числовые колонки тянутся чанками из numpy-генератора: один
+            # вызов rng на колонку вместо 8+ обращений к random.* на строку.
+            for start in range(0, count, chunk_size):
+                n = min(chunk_size, count - start)
+
+                r1 = self.rng.random(n)
+                r2 = self.rng.random(n)
+                small = r1 < 0.8
+                mid = ~small & (r2 < 0.9)
+                members = np.where(
+                    small, self.rng.integers(2, 51, n),
+                    np.where(mid, self.rng.integers(51, 201, n),
+                             self.rng.integers(201, 1001, n))).tolist()
+                flags = _flags_from_bits(
+                    self.rng.integers(0, 1 << 64, n, dtype=np.uint64),
+                    _CHAT_FLAG_T).tolist()
+                has_desc = (self.rng.random(n) < prob_description).tolist()
+                has_pinned = (self.rng.random(n) < prob_pinned).tolist()
+
+                # name (10) и secret (8) всего чанка — одна выборка индексов
+                # и один decode; фото — две целочисленные колонки
+                chars = self._alphabet[
+                    self.rng.integers(0, len(self._alphabet), (n, 18))
+                ].tobytes().decode('ascii')
+                albums = self.rng.integers(1000, 10000, n).tolist()
+                photos = self.rng.integers(1000, 10000, n).tolist()
+
+                # Описания есть лишь у ~5% строк — индексы слов для них
+                # тянутся одной матрицей, а не по вызову на строку
+                descs = {}
+                desc_rows = [j for j in range(n) if has_desc[j]]
+                if desc_rows:
+                    k = len(desc_rows)
+                    wcs = self.rng.integers(5, 16, k).tolist()
+                    picks = self.rng.integers(0, len(_WORDS), (k, 15)).tolist()
+                    for t, j in enumerate(desc_rows):
+                        d = ' '.join(
+                            _WORDS[w] for w in picks[t][:wcs[t]]).capitalize()
+                        if len(d) > 100:
+                            d = d[:97] + "..."
+                        descs[j] = f'"{d}"'
+
+                buf = []
+                for j in range(n):
+                    i = start + j
+                    chat_id = self.chats_lo + i
+                    base = j * 18
+                    name = chars[base:base + 10]
+                    pinned = (self.generate_pinned_message_ids()
+                              if has_pinned[j] else "[]")
+                    secret = chars[base + 10:base + 18]
+                    photo = f"{albums[j]}_{photos[j]}"
+                    desc = descs[j] if has_desc[j] else ""
+                    buf.append(f'{chat_id},{name},"{pinned}",{secret},{photo},'
+                               f'{members[j]},{desc},{flags[j]}\n')
+                    generated_chat_ids.append(chat_id)
+
+                wq.put(''.join(buf).encode('utf-8'))
+
+                elapsed = time.time() - self.metrics['start_time']
+                done = start + n
+                rate = done / elapsed if elapsed > 0 else 0
+                print(f"  Чатов: {done:,}/{count:,} ({rate:.1f} chats/sec)")
+
+            wq.put(None)
+            writer.join()
+
+            actual_size = mm.tell()
+            mm.flush()
+            mm.close()
+            os.ftruncate(fd, actual_size)
+        finally:
+            os.close(fd)
 
         self.metrics['chats_generated'] = count
         print(f"✓ Сгенерировано {count} чатов")
@@ -236,47 +419,69 @@ class CassandraDataGenerator:
                 print("Отменено пользователем")
                 return
 
-        fieldnames = ["user_id", "chat_id", "invite_timestamp", "disable_for",
-                     "flags", "inviter_id", "last_read_message_id",
-                     "last_message_id", "last_message_ts"]
-
-        # Для обеспечения уникальности (user_id, last_message_ts)
-        used_pairs = set()
-
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for i in range(count):
-                # Выбираем случайного пользователя и чат
-                user_id = random.choice(self.user_ids)
-                chat_id = random.choice(chat_ids)
-
-                # Генерируем метку времени приглашения (за последние 3 года)
-                invite_ts = self.generate_timestamp(3)
-
-                # Генерируем last_message_ts (после invite_ts)
-                max_offset = 180 * 24 * 3600  # 180 дней в секундах
-                last_message_ts = invite_ts + random.randint(0, max_offset)
-
-                # Убеждаемся в уникальности пары (user_id, last_message_ts)
-                pair = (user_id, last_message_ts)
-                attempts = 0
-                while pair in used_pairs and attempts < 10:
-                    last_message_ts += random.randint(1, 10)
-                    pair = (user_id, last_message_ts)
-                    attempts += 1
-
-                used_pairs.add(pair)
-
-                row = self.generate_peerid_row(user_id, chat_id, invite_ts)
-                row["last_message_ts"] = last_message_ts
-                writer.writerow(row)
-
-                if (i + 1) % chunk_size == 0:
-                    elapsed = time.time() - self.metrics['start_time']
-                    rate = (i + 1) / elapsed if elapsed > 0 else 0
-                    print(f"  PeerIds: {i + 1:,}/{count:,} ({rate:.1f} records/sec)")
+        # Для обеспечения уникальности (user_id, last_message_ts):
+        # ключ пакуется в один int64 (user_id << 32 | ts). По парадоксу
+        # дней рождения ожидаемое число совпадений ~ count^2 / (2*K), где
+        # K = диапазон пользователей * диапазон ts (~1.5e13); пока оно
+        # пренебрежимо мало, проверку можно не вести вовсе и не держать
+        # set на count ключей в памяти
+        keyspace = (self.users_hi - self.users_lo) * (180 * 24 * 3600)
+        check_unique = count * count > keyspace // 500
+        used_keys = set()
+
+        # Девять целых полей — чистый ASCII: пишем бинарно с 4 МБ буфером,
+        # кодируя чанк за один проход
+        with open(output_file, 'wb', buffering=4 * 1024 * 1024) as csvfile:
+            csvfile.write(b"user_id,chat_id,invite_timestamp,disable_for,"
+                          b"flags,inviter_id,last_read_message_id,"
+                          b"last_message_id,last_message_ts\n")
+            wq, writer = self._start_writer(csvfile)
+
+            chat_ids_arr = np.asarray(chat_ids, dtype=np.int64)
+            for start in range(0, count, chunk_size):
+                n = min(chunk_size, count - start)
+                cols = self._draw_peer_columns(n, chat_ids_arr)
+                users_arr, lmts_arr = cols[0], cols[8]
+
+                # Уникальность (user_id, last_message_ts) проверяется на весь
+                # чанк сразу: пары пакуются в int64-ключи, np.unique находит
+                # внутричанковые дубликаты, проигравшим сдвигается ts — как
+                # раньше по +1..10 за попытку, но массово
+                if check_unique:
+                    keys = (users_arr << 32) | lmts_arr
+                    for _ in range(10):
+                        dup = np.ones(n, dtype=bool)
+                        dup[np.unique(keys, return_index=True)[1]] = False
+                        if used_keys:
+                            dup |= np.fromiter(
+                                (k in used_keys for k in keys.tolist()),
+                                dtype=bool, count=n)
+                        if not dup.any():
+                            break
+                        idx = np.nonzero(dup)[0]
+                        lmts_arr[idx] += self.rng.integers(1, 11, idx.size)
+                        keys = (users_arr << 32) | lmts_arr
+                    used_keys.update(keys.tolist())
+
+                (users, chats_col, invites, disables, flags_col, inviters,
+                 last_reads, last_msgs, lmts) = (c.tolist() for c in cols)
+
+                buf = []
+                for j in range(n):
+                    buf.append(
+                        f'{users[j]},{chats_col[j]},{invites[j]},'
+                        f'{disables[j]},{flags_col[j]},{inviters[j]},'
+                        f'{last_reads[j]},{last_msgs[j]},{lmts[j]}\n')
+
+                wq.put(''.join(buf).encode('ascii'))
+
+                elapsed = time.time() - self.metrics['start_time']
+                done = start + n
+                rate = done / elapsed if elapsed > 0 else 0
+                print(f"  PeerIds: {done:,}/{count:,} ({rate:.1f} records/sec)")
+
+            wq.put(None)
+            writer.join()
 
         self.metrics['peerids_generated'] = count
         print(f"✓ Сгенерировано {count} записей PeerIds")
@@ -289,58 +494,73 @@ class CassandraDataGenerator:
         print(f"Оптимизированная генерация {count} записей PeerIds")
         print(f"Среднее количество пользователей на чат: {users_per_chat}")
 
-        fieldnames = ["user_id", "chat_id", "invite_timestamp", "disable_for",
-                     "flags", "inviter_id", "last_read_message_id",
-                     "last_message_id", "last_message_ts"]
-
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
+        with open(output_file, 'wb', buffering=4 * 1024 * 1024) as csvfile:
+            csvfile.write(b"user_id,chat_id,invite_timestamp,disable_for,"
+                          b"flags,inviter_id,last_read_message_id,"
+                          b"last_message_id,last_message_ts\n")
+            wq, writer = self._start_writer(csvfile)
 
             # Распределяем записи по чатам
             records_per_chat = max(1, count // len(chat_ids))
+            chat_ids_arr = np.asarray(chat_ids, dtype=np.int64)
+            rng = self.rng
+            now_ts = self._now_ts
 
-            buffer = []
             total_generated = 0
-
-            for chat_idx, chat_id in enumerate(chat_ids):
-                if total_generated >= count:
-                    break
-
-                # Количество пользователей в этом чате
-                users_in_chat = min(records_per_chat, count - total_generated)
-                if chat_idx < len(chat_ids) - 1:
-                    users_in_chat = random.randint(1, records_per_chat * 2)
-
-                # Базовое время для этого чата
-                base_ts = self.generate_timestamp(3)
-
-                for user_idx in range(users_in_chat):
-                    if total_generated >= count:
-                        break
-
-                    user_id = random.choice(self.user_ids)
-                    invite_ts = base_ts + random.randint(0, 7 * 24 * 3600)  # В течение недели
-
-                    # Last message ts после invite
-                    last_message_ts = invite_ts + random.randint(0, 180 * 24 * 3600)
-
-                    row = self.generate_peerid_row(user_id, chat_id, invite_ts)
-                    row["last_message_ts"] = last_message_ts
-                    buffer.append(row)
-                    total_generated += 1
-
-                    # Периодически сбрасываем буфер
-                    if len(buffer) >= 1000:
-                        writer.writerows(buffer)
-                        buffer.clear()
-
-                        if total_generated % 10000 == 0:
-                            print(f"  Прогресс: {total_generated:,}/{count:,}")
-
-            # Записываем оставшиеся данные
-            if buffer:
-                writer.writerows(buffer)
+            pos = 0
+
+            # SoA: набираем чаты, пока чанк не наберёт ~64K строк, затем
+            # заполняем по одной numpy-колонке на CSV-поле и форматируем
+            # строки единственным финальным проходом zip
+            while total_generated < count and pos < len(chat_ids_arr):
+                counts = []
+                take = 0
+                while (pos + len(counts) < len(chat_ids_arr)
+                       and total_generated + take < count
+                       and take < 65536):
+                    if pos + len(counts) < len(chat_ids_arr) - 1:
+                        c = random.randint(1, records_per_chat * 2)
+                    else:
+                        c = records_per_chat
+                    c = min(c, count - total_generated - take)
+                    counts.append(c)
+                    take += c
+                k = len(counts)
+                counts_arr = np.asarray(counts)
+
+                chats_col = np.repeat(chat_ids_arr[pos:pos + k], counts_arr)
+                # Базовое время на чат; приглашения в течение недели после
+                base_col = np.repeat(
+                    now_ts - rng.integers(0, 3 * 365 * 24 * 3600, k),
+                    counts_arr)
+                invites = base_col + rng.integers(0, 7 * 24 * 3600, take)
+                lmts = invites + rng.integers(0, 180 * 24 * 3600, take)
+                cols = (
+                    rng.integers(self.users_lo, self.users_hi, take),
+                    chats_col,
+                    invites,
+                    np.where(rng.random(take) < 0.1,
+                             rng.integers(0, 101, take), 0),
+                    _flags_from_bits(
+                        rng.integers(0, 1 << 64, take, dtype=np.uint64),
+                        _PEER_FLAG_T),
+                    rng.integers(self.users_lo, self.users_hi, take),
+                    rng.integers(0, 10001, take),
+                    rng.integers(0, 10001, take),
+                    lmts,
+                )
+
+                buf = [f'{u},{c},{i},{d},{f},{iv},{lr},{lm},{lt}\n'
+                       for u, c, i, d, f, iv, lr, lm, lt
+                       in zip(*(col.tolist() for col in cols))]
+                wq.put(''.join(buf).encode('ascii'))
+
+                pos += k
+                total_generated += take
+                print(f"  Прогресс: {total_generated:,}/{count:,}")
+
+            wq.put(None)
+            writer.join()
 
         print(f"✓ Сгенерировано {total_generated} записей PeerIds")
 
@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+"""
+Генератор CQL файлов с INSERT для таблицы Messages
+
+Выходной файл скармливается cqlsh напрямую или разбирается
+docker_dsbulk_loader.convert_sql_to_csv для загрузки через DSBulk.
+"""
+
+import argparse
+import mmap
+import os
+import queue
+import shutil
+import threading
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    # Собранное Cython-расширение (cythonize -i _fast_format.pyx):
+    # numba не ускоряет строковое форматирование, snprintf в C — да
+    from _fast_format import format_insert as _c_format_insert
+    HAS_FAST_FORMAT = True
+except ImportError:
+    HAS_FAST_FORMAT = False
+
+# Вероятности и веса битов флагов сообщений (прочитано/ред./удал./переслано/ответ)
+_FLAG_P = np.array([0.8, 0.1, 0.02, 0.15, 0.3])
+_FLAG_BITS = np.array([1, 2, 4, 8, 16], dtype=np.uint8)
+
+# Варианты TTL в секундах (час/сутки/неделя/месяц)
+_TTL_CHOICES = np.array([3600, 86400, 604800, 2592000], dtype=np.int64)
+
+# Опорная эпоха 2020-01-01T00:00:00Z литералом: все даты — чистая
+# целочисленная арифметика, и datetime не нужен даже на импорте (заодно
+# база перестала зависеть от локального часового пояса машины)
+_BASE_EPOCH = 1577836800
+
+if HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _fill_numeric(base_epoch, days, hours, minutes, seconds,
+                      u_edit, edit_delta, u_ttl, ttl_idx, ttl_choices):
+        """JIT-цикл числовых колонок: даты, времена правки и TTL разом"""
+        n = days.shape[0]
+        dates = np.empty(n, np.int64)
+        upd = np.empty(n, np.int64)
+        ttls = np.zeros(n, np.int64)
+        for i in range(n):
+            d = (base_epoch - days[i] * 86400
+                 + hours[i] * 3600 + minutes[i] * 60 + seconds[i])
+            dates[i] = d
+            if u_edit[i] < 0.1:
+                d += edit_delta[i]
+            upd[i] = d
+            if u_ttl[i] < 0.05:
+                ttls[i] = ttl_choices[ttl_idx[i]]
+        return dates, upd, ttls
+
+# Однострочный %-шаблон INSERT: компилируется один раз, '%' в CPython
+# идёт по быстрому пути PyUnicode_Format без парсинга f-строки на вызов
+_INSERT_TPL = (
+    "INSERT INTO Messages (chat_id, bucket, chat_msg_local_id, flags, date, "
+    "update_time, author_id, text, kludges, forwarded, forwarded_message_ids, "
+    "mentions, marked_users, ttl, deleted_for_all) "
+    "VALUES (%d, %d, %d, %d, %d, %d, %d, '%s', '%s', %s, %s, '%s', %s, %d, %s)")
+
+# Быстрый шаблон для типовой формы строки (~60% сообщений): пустые
+# kludges/forwarded/marked и нулевой TTL запечены литералами, остаётся
+# 10 подстановок вместо 15 и ни одного форматирования списков
+_FAST_TPL = (
+    "INSERT INTO Messages (chat_id, bucket, chat_msg_local_id, flags, date, "
+    "update_time, author_id, text, kludges, forwarded, forwarded_message_ids, "
+    "mentions, marked_users, ttl, deleted_for_all) "
+    "VALUES (%d, %d, %d, %d, %d, %d, %d, '%s', '{}', false, [], '%s', [], 0, %s)")
+
+# Таблица экранирования одиночной кавычки для CQL-строк
+_ESC = str.maketrans({"'": "''"})
+
+# CQL-булевы литералы индексируются флагом — без ветки на поле
+_BOOL = ('false', 'true')
+
+# Плейсхолдеры полного набора колонок для узких шаблонов --columns
+_COL_FMT = {
+    'chat_id': '%d', 'bucket': '%d', 'chat_msg_local_id': '%d',
+    'flags': '%d', 'date': '%d', 'update_time': '%d', 'author_id': '%d',
+    'ttl': '%d', 'text': "'%s'", 'kludges': "'%s'", 'mentions': "'%s'",
+    'forwarded': '%s', 'forwarded_message_ids': '%s', 'marked_users': '%s',
+    'deleted_for_all': '%s',
+}
+
+# Ключ партиции и кластеризации обязателен в любом наборе колонок
+_KEY_COLS = ('chat_id', 'bucket', 'chat_msg_local_id')
+
+class MessageGenerator:
+    # Сколько первых INSERT копим в памяти для файла-образца
+    _SAMPLE_LINES = 20
+
+    # Типы упоминаний: none 70%, all/online/user по 10%
+    _MENTION_TYPES = ('none', 'all', 'online', 'user')
+
+    # Схема kludges фиксирована, поэтому JSON собирается %-шаблоном без
+    # обхода словаря и диспетчеризации типов в json.dumps; отсутствующие
+    # размеры/длительность подставляются литералом null
+    _KL_TPL = ('{"type": "%s", "id": "%s", "size": %d, '
+               '"url": "https://cdn.example.com/%s/%08x", '
+               '"width": %s, "height": %s, "duration": %s}')
+
+    def __init__(self, seed: int = 42, use_batch: bool = False,
+                 batch_size: int = 100, columns: list = None):
+        """Инициализация генератора с сидом для воспроизводимости"""
+        self.rng = np.random.default_rng(seed)
+        self.use_batch = use_batch
+        self.batch_size = batch_size
+
+        # Узкий набор колонок: шаблон собирается один раз, а вычисление
+        # полей, которые в INSERT не попадут, отключается масками
+        self._cols = None
+        self._narrow_tpl = None
+        self._shape_mask = 0b1111
+        if columns:
+            unknown = [c for c in columns if c not in _COL_FMT]
+            if unknown:
+                raise ValueError(f"Неизвестные колонки: {', '.join(unknown)}")
+            missing = [c for c in _KEY_COLS if c not in columns]
+            if missing:
+                raise ValueError(
+                    f"--columns обязан включать ключ: {', '.join(missing)}")
+            self._cols = tuple(columns)
+            self._narrow_tpl = (
+                "INSERT INTO Messages (" + ", ".join(columns) + ") "
+                "VALUES (" + ", ".join(_COL_FMT[c] for c in columns) + ")")
+            for bit, col in enumerate(('kludges', 'forwarded_message_ids',
+                                       'marked_users', 'ttl')):
+                if col not in columns:
+                    self._shape_mask &= ~(1 << bit)
+        self._id_offset = 0  # Сдвиг id сообщений при шардированной генерации
+        self._block_base = 0  # Начало текущего блока предвыборки
+        self._sample_lines = []  # Первые INSERT прогона для create_sample_file
+
+        # Статистика для правдоподобных данных: id берутся арифметикой по
+        # границам, без материализации списков на ~60 MB упакованных PyLong
+        self.users_lo, self.users_hi = 1000, 1000000  # 1M пользователей
+        self.chats_lo, self.chats_hi = 1000, 500000   # 500K чатов
+        self.common_words = (
+            "привет", "как", "дела", "нормально", "спасибо", "пока", "что", "где",
+            "когда", "почему", "сегодня", "завтра", "вчера", "работа", "дом", "друзья",
+            "встреча", "совещание", "проект", "задача", "срочно", "важно", "файл", "ссылка"
+        )
+        self.kludge_types = ('photo', 'video', 'document', 'audio', 'voice', 'sticker')
+
+        # Обе капитализации каждого слова считаются один раз — дальше
+        # только индексация параллельных кортежей
+        self._words_lo = self.common_words
+        self._words_cap = tuple(w.capitalize() for w in self.common_words)
+
+    # Размер блока предвыборки: колонки случайности на ~20 полей занимают
+    # ~150 байт на строку, блок держит память прогона в пределах ~150 MB
+    # независимо от count
+    _PRE_BLOCK = 1_000_000
+
+    def _precompute(self, count: int) -> None:
+        """Предвыборка случайности на блок сообщений.
+
+        Все вероятностные гейты и индексы рисуются одним C-вызовом RNG на
+        колонку вместо десятков random.* на каждое сообщение; по месту
+        остаются только редкие строковые ветки. Вызывается поблочно из
+        generate_file, чтобы не аллоцировать колонки на весь count сразу.
+        """
+        rng = self.rng
+        # Флаги сразу упакованной колонкой: 5 сравнений и редукция в C
+        # вместо пяти веток интерпретатора на сообщение
+        self._flags = ((rng.random((count, 5)) < _FLAG_P)
+                       * _FLAG_BITS).sum(axis=1).astype(np.int32)
+        self._u_edit = rng.random(count)
+        self._u_media = rng.random(count)
+        self._u_fwd = rng.random(count)
+        self._u_marked = rng.random(count)
+        self._u_ttl = rng.random(count)
+        self._u_del = rng.random(count)
+        self._author_idx = rng.integers(0, self.users_hi - self.users_lo, count)
+        self._chat_idx = rng.integers(0, self.chats_hi - self.chats_lo, count)
+        self._days = rng.integers(0, 3 * 365, count)
+        self._hours = rng.integers(0, 24, count)
+        self._minutes = rng.integers(0, 60, count)
+        self._seconds = rng.integers(0, 60, count)
+        self._edit_delta = rng.integers(60, 3601, count)
+        self._ttl_idx = rng.integers(0, 4, count)
+
+        # Упоминания: кандидаты и длина списка заранее; с запасом в 6
+        # индексов — совпадение с автором просто пропускается в цикле
+        self._marked_idx = rng.integers(0, self.users_hi - self.users_lo,
+                                        (count, 6), dtype=np.int32)
+        self._marked_count = rng.integers(1, 6, count)
+
+        # Локальные id и бакеты блока — одна векторная арифметика вместо
+        # сложения и деления на каждую строку
+        base = self._id_offset + self._block_base
+        self._local_ids = np.arange(base, base + count, dtype=np.int64)
+        self._buckets = self._local_ids // 1000
+
+        # Маска формы строки: биты медиа/пересылка/упоминания/TTL.
+        # Нулевая форма уходит в специализированный шаблон _FAST_TPL
+        self._shape = ((self._u_media < 0.3).astype(np.uint8)
+                       | ((self._u_fwd < 0.15).astype(np.uint8) << 1)
+                       | ((self._u_marked < 0.2).astype(np.uint8) << 2)
+                       | ((self._u_ttl < 0.05).astype(np.uint8) << 3))
+
+        if HAS_NUMBA:
+            # Даты, времена правки и TTL одним скомпилированным циклом
+            self._dates, self._update_times, self._ttls = _fill_numeric(
+                _BASE_EPOCH, self._days, self._hours, self._minutes,
+                self._seconds, self._u_edit, self._edit_delta,
+                self._u_ttl, self._ttl_idx, _TTL_CHOICES)
+        else:
+            # Фоллбэк тоже векторный: эпоха и смещения целыми числами,
+            # без datetime/timedelta и календарной нормализации на строку
+            self._dates = (_BASE_EPOCH - self._days * 86400
+                           + self._hours * 3600 + self._minutes * 60
+                           + self._seconds)
+            self._update_times = self._dates + np.where(
+                self._u_edit < 0.1, self._edit_delta, 0)
+            self._ttls = np.where(
+                self._u_ttl < 0.05, _TTL_CHOICES[self._ttl_idx], 0)
+
+        # Пересланные сообщения: длина списка и кандидаты с запасом тоже
+        # колонками — редкая ветка лишь режет строку по счётчику
+        self._fwd_count = rng.integers(1, 4, count)
+        self._fwd_ids = rng.integers(1000000, 10000000, (count, 3))
+
+        # Медиа: тип и 8-символьный hex-слаг URL без MD5 на каждый аттач
+        self._media_type_idx = rng.integers(0, 6, count)
+        self._slug = rng.integers(0, 16**8, count, dtype=np.uint32)
+        # 128 бит id аттача двумя uint64-колонками: uuid4 ходил в
+        # os.urandom и гонял валидацию на каждый медиа-аттач, а
+        # криптостойкость синтетическим id не нужна
+        self._uid_hi = rng.integers(0, 1 << 64, count, dtype=np.uint64)
+        self._uid_lo = rng.integers(0, 1 << 64, count, dtype=np.uint64)
+        # Размеры/габариты/длительность аттачей тоже колонками: ветка
+        # медиа не делает ни одного скалярного обращения к RNG
+        self._media_size = rng.integers(1024, 50 * 1024 * 1024, count)
+        self._media_w = rng.integers(640, 2561, count)
+        self._media_h = rng.integers(480, 1441, count)
+        self._media_d = rng.integers(1, 301, count)
+
+        # Текст: индексы слов, маска капитализации и пунктуация на весь
+        # прогон; в generate_text остаётся только сборка строки
+        self._wc = rng.integers(1, 3, count)
+        self._widx = rng.integers(0, len(self.common_words), (count, 2),
+                                  dtype=np.int32)
+        self._cap = rng.random((count, 2)) < 0.3
+        self._punct = rng.random(count) < 0.7
+        self._punct_idx = rng.integers(0, 3, count)
+
+        # Тип упоминаний лесенкой порогов по одной равномерной колонке:
+        # rng.choice с весами готовил дистрибуцию заново на каждый вызов
+        u_mention = rng.random(count)
+        self._mention_idx = ((u_mention >= 0.7).astype(np.int8)
+                             + (u_mention >= 0.8) + (u_mention >= 0.9))
+
+    def generate_flags(self, i: int) -> int:
+        """Флаги сообщения: чтение готовой упакованной колонки"""
+        return int(self._flags[i])
+
+    def generate_timestamp(self, i: int) -> int:
+        """Timestamp в секундах: чтение предвычисленной колонки дат"""
+        return int(self._dates[i])
+
+    def generate_text(self, i: int) -> str:
+        """Текст сообщения из предвыбранных индексов слов"""
+        widx = self._widx[i]
+        cap = self._cap[i]
+        lo = self._words_lo
+        up = self._words_cap
+
+        # Слов одно или два: прямые конкатенации дешевле сборки
+        # списка и join на таких длинах
+        text = (up if cap[0] else lo)[widx[0]]
+        if self._wc[i] > 1:
+            text += ' ' + (up if cap[1] else lo)[widx[1]]
+        if self._punct[i]:
+            text += '.!?'[self._punct_idx[i]]
+
+        return text
+
+    def generate_kludges(self, i: int) -> str:
+        """Генерация kludges (сжатых аттачей)"""
+        if self._u_media[i] < 0.3:  # 30% сообщений с медиа
+            media_type = self.kludge_types[self._media_type_idx[i]]
+            sized = media_type in ('photo', 'video')
+            hx = f'{self._uid_hi[i]:016x}{self._uid_lo[i]:016x}'
+            uid = f'{hx[:8]}-{hx[8:12]}-{hx[12:16]}-{hx[16:20]}-{hx[20:]}'
+            return self._KL_TPL % (
+                media_type, uid,
+                int(self._media_size[i]),
+                media_type, self._slug[i],
+                int(self._media_w[i]) if sized else 'null',
+                int(self._media_h[i]) if sized else 'null',
+                int(self._media_d[i])
+                if media_type in ('video', 'audio', 'voice') else 'null')
+
+        return "{}"
+
+    def generate_forwarded_message_ids(self, i: int) -> str:
+        """Генерация списка пересланных сообщений в CQL-виде '[..]'"""
+        if self._u_fwd[i] < 0.15:  # 15% сообщений пересланы
+            ids = self._fwd_ids[i, :self._fwd_count[i]].tolist()
+            return '[' + ', '.join(map(str, ids)) + ']'
+        return '[]'
+
+    def generate_mentions(self, i: int) -> str:
+        """Тип упоминаний: чтение предвычисленного индекса"""
+        return self._MENTION_TYPES[self._mention_idx[i]]
+
+    def generate_marked_users(self, i: int, author_id: int) -> str:
+        """Генерация списка упомянутых пользователей в CQL-виде '[..]'"""
+        if self._u_marked[i] < 0.2:  # 20% сообщений с упоминаниями
+            # Выборка по индексам O(k): без копирования кандидатов из
+            # миллионного списка пользователей на каждый вызов
+            lo = self.users_lo
+            users = [lo + idx for idx in self._marked_idx[i]
+                     if lo + idx != author_id][:self._marked_count[i]]
+            return '[' + ', '.join(map(str, users)) + ']'
+        return '[]'
+
+    def generate_ttl(self, i: int) -> int:
+        """TTL в секундах: чтение предвычисленной колонки"""
+        return int(self._ttls[i])
+
+    def generate_message(self, i: int) -> dict:
+        """Генерация одного сообщения из предвыбранных массивов"""
+        chat_id = self.chats_lo + int(self._chat_idx[i])
+        author_id = self.users_lo + int(self._author_idx[i])
+        need = self._cols
+
+        # Числовые колонки предвычислены целиком (numba или numpy)
+        date = int(self._dates[i])
+        update_time = int(self._update_times[i])
+        ttl = int(self._ttls[i])
+
+        # Биты формы невостребованных колонок гасятся маской — их
+        # генераторы при узком INSERT не вызываются вовсе
+        shape = int(self._shape[i]) & self._shape_mask
+        if shape:
+            kludges = self.generate_kludges(i)
+            forwarded_message_ids = self.generate_forwarded_message_ids(i)
+            marked_users = self.generate_marked_users(i, author_id)
+        else:
+            # Типовая форма: гейтнутые генераторы даже не вызываются
+            kludges = "{}"
+            forwarded_message_ids = '[]'
+            marked_users = '[]'
+        # Флаг пересылки — бит 1 маски формы: тот же гейт, что наполняет
+        # forwarded_message_ids, так что источник истины один, а
+        # сравнение строк на каждую строку не нужно
+        forwarded = bool(shape & 2)
+
+        return {
+            "shape": shape,
+            "chat_id": chat_id,
+            "bucket": int(self._buckets[i]),
+            "chat_msg_local_id": int(self._local_ids[i]),
+            "flags": self.generate_flags(i),
+            "date": date,
+            "update_time": update_time,
+            "author_id": author_id,
+            "text": (self.generate_text(i)
+                     if need is None or 'text' in need else ''),
+            "kludges": kludges,
+            "forwarded": forwarded,
+            "forwarded_message_ids": forwarded_message_ids,
+            "mentions": (self.generate_mentions(i)
+                         if need is None or 'mentions' in need else 'none'),
+            "marked_users": marked_users,
+            "ttl": ttl,
+            # bool(): numpy.bool_ из сравнения не годится как индекс
+            # кортежа _BOOL на NumPy 2.x
+            "deleted_for_all": bool(self._u_del[i] < 0.01)
+        }
+
+    def generate_insert_statement(self, msg: dict, terminator: str = ';') -> str:
+        """Сборка одного CQL INSERT.
+
+        Шаблоны не содержат ';' — терминатор доклеивается вызывающим, и
+        BATCH-путь обходится без rstrip-скана каждой строки.
+        """
+        if self._narrow_tpl is not None:
+            vals = []
+            for k in self._cols:
+                v = msg[k]
+                if k == 'kludges' and msg['shape'] & 1:
+                    v = v.translate(_ESC)
+                elif k == 'forwarded' or k == 'deleted_for_all':
+                    v = _BOOL[v]
+                vals.append(v)
+            return self._narrow_tpl % tuple(vals) + terminator
+
+        if HAS_FAST_FORMAT:
+            kludges = msg['kludges']
+            return _c_format_insert(
+                msg['chat_id'], msg['bucket'], msg['chat_msg_local_id'],
+                msg['flags'], msg['date'], msg['update_time'],
+                msg['author_id'], msg['text'].encode(),
+                (kludges.translate(_ESC) if msg['shape'] & 1
+                 else kludges).encode(),
+                msg['forwarded'], msg['forwarded_message_ids'].encode(),
+                msg['mentions'].encode(), msg['marked_users'].encode(),
+                msg['ttl'], msg['deleted_for_all'], terminator.encode())
+
+        # text собирается из словаря без апострофов, mentions — фиксированный
+        # enum: экранировать их — пустой прогон по каждой строке
+        if msg['shape'] == 0:
+            return _FAST_TPL % (
+                msg['chat_id'], msg['bucket'], msg['chat_msg_local_id'],
+                msg['flags'], msg['date'], msg['update_time'],
+                msg['author_id'], msg['text'], msg['mentions'],
+                _BOOL[msg['deleted_for_all']]) + terminator
+
+        kludges_esc = msg['kludges'].translate(_ESC)
+        return _INSERT_TPL % (
+            msg['chat_id'], msg['bucket'], msg['chat_msg_local_id'],
+            msg['flags'], msg['date'], msg['update_time'], msg['author_id'],
+            msg['text'], kludges_esc,
+            _BOOL[msg['forwarded']],
+            msg['forwarded_message_ids'], msg['mentions'],
+            msg['marked_users'], msg['ttl'],
+            _BOOL[msg['deleted_for_all']]) + terminator
+
+    def generate_batch_insert(self, messages: list) -> str:
+        """Сборка BEGIN BATCH ... APPLY BATCH из группы сообщений"""
+        partitions = {(m['chat_id'], m['bucket']) for m in messages}
+        if len(partitions) > 1:
+            # Мультипартиционный unlogged BATCH грузит координатор и
+            # замедляет запись — батчи полезны только в одну партицию
+            print(f"⚠️  BATCH на {len(partitions)} партиций — "
+                  f"группируйте по (chat_id, bucket)")
+
+        # Сборка списком и join: без квадратичного += и без повторного
+        # сканирования каждого INSERT ради снятия терминатора
+        parts = ["BEGIN BATCH"]
+        for msg in messages:
+            parts.append("    " + self.generate_insert_statement(msg))
+        parts.append("APPLY BATCH;")
+        return "\n".join(parts)
+
+    def generate_file(self, count: int, output_file: str,
+                      start_idx: int = 0, parallel: bool = True) -> None:
+        """Генерация CQL файла с count сообщениями"""
+        if parallel and count > 100_000:
+            # Большие прогоны шардируем по ядрам
+            self._generate_file_sharded(count, output_file)
+            return
+
+        self._id_offset = start_idx
+        # Первые строки запоминаем по ходу генерации — образец потом
+        # отдаётся из памяти без повторного чтения большого файла
+        self._sample_lines = []
+        print(f"Генерация {count} INSERT в файл {output_file}")
+        print(f"Режим: {'BATCH по ' + str(self.batch_size) if self.use_batch else 'одиночные INSERT'}")
+
+        start_time = time.time()
+
+        # Байтовый аккумулятор ~4 MiB: bytearray растёт геометрически без
+        # промежуточного списка строк и join-копии, наружу уходит одним
+        # куском — write() на каждый INSERT не существует в принципе
+        FLUSH_SIZE = 4 << 20
+
+        # Запись уходит в фоновый поток через ограниченную очередь:
+        # генерация (CPU) и диск (I/O) перекрываются, а maxsize даёт
+        # обратное давление при медленном диске
+        chunk_q = queue.Queue(maxsize=8)
+        written = 0
+
+        # Без BATCH размер известен заранее с запасом: файл преаллоцируем
+        # ftruncate и пишем в mmap по смещению — копия сразу в страничный
+        # кэш, без syscall write() на каждый мегабайт. В конце файл
+        # обрезается до фактической длины. BATCH-режим пишет как раньше:
+        # его верхняя оценка размера зависит от раскладки групп.
+        use_mmap = not self.use_batch
+        ROW_CAP = 2048  # верхняя оценка длины одной строки INSERT
+
+        if use_mmap:
+            fd = os.open(output_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+            os.ftruncate(fd, count * ROW_CAP)
+            mm = mmap.mmap(fd, count * ROW_CAP)
+            f = None
+        else:
+            fd = None
+            mm = None
+            # BATCH-путь пишет через обычный файл — буфер 8 MiB, чтобы
+            # мегабайтные чанки из очереди не дробились на мелкие write()
+            f = open(output_file, 'wb', buffering=8 << 20)
+
+        def _drain():
+            nonlocal written
+            while (chunk := chunk_q.get()) is not None:
+                if use_mmap:
+                    mm[written:written + len(chunk)] = chunk
+                else:
+                    f.write(chunk)
+                written += len(chunk)
+
+        writer = threading.Thread(target=_drain)
+        writer.start()
+        try:
+            buf = bytearray()
+            # BATCH собираем по партициям: только батч в один (chat_id,
+            # bucket) не нагружает координатор Cassandra
+            batch_groups = {}
+            # Горячие методы в локалы: LOAD_FAST вместо двух словарных
+            # поисков на каждое из миллионов сообщений
+            gen_message = self.generate_message
+            gen_insert = self.generate_insert_statement
+            sample_lines = self._sample_lines
+            for base in range(0, count, self._PRE_BLOCK):
+                block = min(self._PRE_BLOCK, count - base)
+                self._block_base = base
+                self._precompute(block)
+
+                for j in range(block):
+                    i = base + j
+                    msg = gen_message(j)
+
+                    if self.use_batch:
+                        key = (msg['chat_id'], msg['bucket'])
+                        group = batch_groups.setdefault(key, [])
+                        group.append(msg)
+                        if len(group) >= self.batch_size:
+                            buf += self.generate_batch_insert(group).encode('utf-8')
+                            buf += b'\n'
+                            del batch_groups[key]
+                    else:
+                        # Перевод строки запекается в терминатор: одна
+                        # конкатенация и один extend буфера на строку
+                        insert = gen_insert(msg, ';\n')
+                        if len(sample_lines) < self._SAMPLE_LINES:
+                            sample_lines.append(insert)
+                        buf += insert.encode('utf-8')
+
+                    if len(buf) > FLUSH_SIZE:
+                        chunk_q.put(bytes(buf))
+                        buf.clear()
+
+                    if (i + 1) % 10000 == 0:
+                        elapsed = time.time() - start_time
+                        print(f"  Сгенерировано: {i + 1:,}/{count:,} "
+                              f"({(i + 1)/count*100:.1f}%), "
+                              f"скорость: {(i + 1)/elapsed:.1f} msg/sec")
+
+            for group in batch_groups.values():
+                buf += self.generate_batch_insert(group).encode('utf-8')
+                buf += b'\n'
+            if buf:
+                chunk_q.put(bytes(buf))
+        finally:
+            # Сентинел — в finally: иначе упавшая генерация оставляет
+            # non-daemon писателя навсегда в queue.get(), и вместо
+            # трейсбека процесс молча виснет. join обязательно до
+            # закрытия mm/f — писатель ещё пишет в них
+            chunk_q.put(None)
+            writer.join()
+            if use_mmap:
+                mm.close()
+                os.ftruncate(fd, written)
+                os.close(fd)
+            else:
+                f.close()
+
+        elapsed = time.time() - start_time
+        # Размер известен из счётчика писателя — без stat по закрытому файлу
+        file_size = written
+        print(f"\n✓ Генерация завершена!")
+        print(f"  Время: {elapsed:.1f} сек")
+        print(f"  Скорость: {count/elapsed:.1f} msg/sec")
+        print(f"  Размер файла: {file_size/1024/1024:.1f} MB")
+
+    def _generate_file_sharded(self, count: int, output_file: str) -> None:
+        """Шардированная генерация: части файла по процессам, потом склейка.
+
+        Сообщения независимы, поэтому каждый воркер пишет свой .partN со
+        своим дочерним сидом; итоговый файл собирается copyfileobj.
+        """
+        workers = os.cpu_count() or 1
+        per_shard = -(-count // workers)  # ceil
+
+        child_seeds = [int(ss.generate_state(1)[0])
+                       for ss in np.random.SeedSequence(
+                           int(self.rng.integers(1 << 31))).spawn(workers)]
+
+        jobs = []
+        planned = 0
+        for shard_id in range(workers):
+            records = min(per_shard, count - planned)
+            if records <= 0:
+                break
+            jobs.append((child_seeds[shard_id], planned, records,
+                         f"{output_file}.part{shard_id}",
+                         self.use_batch, self.batch_size, self._cols))
+            planned += records
+
+        print(f"Генерация {count} INSERT в {len(jobs)} процессах...")
+        gen_start = time.time()
+        with Pool(len(jobs)) as pool:
+            shard_stats = pool.map(_gen_shard_file, jobs)
+        gen_elapsed = time.time() - gen_start
+
+        with open(output_file, 'wb') as dst:
+            for job in jobs:
+                part = job[3]
+                with open(part, 'rb') as src:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                os.remove(part)
+
+        # Метрики собираются с воркеров, а не повторным обходом файлов
+        total_bytes = sum(size for _, size, _ in shard_stats)
+        busiest = max(elapsed for _, _, elapsed in shard_stats)
+        print(f"✓ Склеено {len(jobs)} шардов в {output_file} "
+              f"({total_bytes/1024/1024:.1f} MB)")
+        print(f"  Суммарно: {count/gen_elapsed:.1f} msg/sec "
+              f"(самый долгий шард: {busiest:.1f} сек)")
+
+    def create_sample_file(self, source_file: str, sample_file: str,
+                           lines: int = 20) -> None:
+        """Создаёт маленький файл-образец из начала большого"""
+        if self._sample_lines:
+            # Строки уже накоплены при генерации — большой файл не трогаем
+            sample = self._sample_lines[:lines]
+        else:
+            with open(source_file, 'r', encoding='utf-8') as src:
+                sample = []
+                for _ in range(lines):
+                    line = src.readline()
+                    if not line:
+                        break
+                    sample.append(line)
+
+        with open(sample_file, 'w', encoding='utf-8') as dst:
+            dst.writelines(sample)
+
+        print(f"✓ Образец: {sample_file} ({len(sample)} строк)")
+
+def _gen_shard_file(job: tuple) -> tuple:
+    """Работник пула процессов: генерирует один шард файла.
+
+    Возвращает (путь, байт записано, секунд) — родитель агрегирует
+    метрики без повторного stat каждого куска.
+    """
+    seed, start_idx, records, output_file, use_batch, batch_size, cols = job
+    generator = MessageGenerator(seed=seed, use_batch=use_batch,
+                                 batch_size=batch_size,
+                                 columns=list(cols) if cols else None)
+    shard_start = time.time()
+    generator.generate_file(records, output_file,
+                            start_idx=start_idx, parallel=False)
+    return output_file, os.path.getsize(output_file), time.time() - shard_start
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Генератор CQL INSERT файлов для таблицы Messages'
+    )
+    parser.add_argument('--count', type=int, default=1000,
+                       help='Количество сообщений для генерации')
+    parser.add_argument('--output', type=str, default='messages.cql',
+                       help='Имя выходного CQL файла')
+    parser.add_argument('--seed', type=int, default=42,
+                       help='Seed для случайного генератора')
+    parser.add_argument('--batch', action='store_true',
+                       help='Группировать INSERT в BEGIN BATCH по партициям '
+                            '(по умолчанию одиночные INSERT — быстрее для Cassandra)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                       help='INSERT в одном BATCH')
+    parser.add_argument('--sample', action='store_true',
+                       help='Создать файл-образец из первых 20 строк')
+    parser.add_argument('--columns', type=str, default=None,
+                       help='Подмножество колонок через запятую (ключ '
+                            'chat_id,bucket,chat_msg_local_id обязателен); '
+                            'невостребованные поля не вычисляются')
+
+    args = parser.parse_args()
+
+    generator = MessageGenerator(
+        seed=args.seed,
+        use_batch=args.batch,
+        batch_size=args.batch_size,
+        columns=args.columns.split(',') if args.columns else None
+    )
+    generator.generate_file(args.count, args.output)
+
+    if args.sample:
+        # Префикс только к имени файла: --output с каталогом иначе даёт
+        # несуществующий путь вида 'sample_/tmp/x/msgs.cql'
+        sample_file = os.path.join(os.path.dirname(args.output),
+                                   'sample_' + os.path.basename(args.output))
+        generator.create_sample_file(args.output, sample_file)
+
+if __name__ == "__main__":
+    main()
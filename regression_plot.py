@@ -12,8 +12,9 @@ def load_data(csv_file):
     """Загружает данные из CSV: count,disk_kb"""
     try:
         df = pd.read_csv(csv_file, names=['count', 'disk_kb'], header=None)
-        df['bytes_per_record'] = df['disk_kb'] / df['count'].replace(0, np.nan)
-        df = df.dropna().sort_values('count')
+        # Одна маска вместо replace(0, nan) + dropna — см. plotter.load_data
+        df = df[df['count'] > 0].sort_values('count')
+        df['bytes_per_record'] = df['disk_kb'] / df['count']
         return df
     except FileNotFoundError:
         print(f"❌ Файл {csv_file} не найден")
@@ -26,7 +27,12 @@ def plot_regression(df, title, forecast_count):
 
     # График 1: Записи vs Размер
     ax1.scatter(df['count'], df['disk_kb']/1024, s=200, alpha=0.8, color='darkblue')
-    z = np.polyfit(df['count'], df['disk_kb'], 1)
+    # full=True отдаёт сумму квадратов остатков тем же проходом — R²
+    # выводится из RSS/TSS без отдельного прогона corrcoef по данным
+    z, resid, *_ = np.polyfit(df['count'], df['disk_kb'], 1, full=True)
+    y = df['disk_kb'].to_numpy()
+    tss = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - resid[0] / tss if resid.size and tss > 0 else 1.0
     p = np.poly1d(z)
     ax1.plot(df['count'], p(df['count']), "r--", linewidth=3, alpha=0.9)
     ax1.set_xlabel('Количество записей')
@@ -67,10 +73,10 @@ def plot_regression(df, title, forecast_count):
     ax4.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    return z, df['bytes_per_record'].iloc[-1], p
+    return z, df['bytes_per_record'].iloc[-1], p, r2
 
 
-def print_stats(df, z, bytes_per_rec, forecast_count, title, p):
+def print_stats(df, z, bytes_per_rec, forecast_count, title, p, r2):
     """Выводит статистику"""
     current_count = df['count'].iloc[-1]
     current_size_mb = df['disk_kb'].iloc[-1] / 1024
@@ -83,7 +89,7 @@ def print_stats(df, z, bytes_per_rec, forecast_count, title, p):
     print(f"💾 Размер сейчас: {current_size_mb:.1f} MB")
     print(f"📏 Байт/запись: {bytes_per_rec:.0f}")
     print(f"📈 Коэффициент регрессии: a={z[0]:.2e}, b={z[1]:.0f}")
-    print(f"R²: {np.corrcoef(df['count'], df['disk_kb'])[0,1]:.3f}")
+    print(f"R²: {r2:.3f}")
     print(f"🎯 Прогноз {forecast_count:,} записей: {forecast_size_mb:.1f} MB ({forecast_size_tb:.3f} TB)")
 
 
@@ -101,8 +107,8 @@ def main():
     # Чаты
     df_chats = load_data(CSV_CHAT_FILE)
     if df_chats is not None and not df_chats.empty:
-        z_chats, bytes_chats, p_chats = plot_regression(df_chats, 'Чаты', args.chats_forecast)
-        print_stats(df_chats, z_chats, bytes_chats, args.chats_forecast, 'ЧАТЫ', p_chats)
+        z_chats, bytes_chats, p_chats, r2_chats = plot_regression(df_chats, 'Чаты', args.chats_forecast)
+        print_stats(df_chats, z_chats, bytes_chats, args.chats_forecast, 'ЧАТЫ', p_chats, r2_chats)
         plt.savefig('chats_regression.png', dpi=300, bbox_inches='tight')
         plt.draw()
         plt.pause(0.1)
@@ -110,8 +116,8 @@ def main():
     # PeerIDs
     df_peerids = load_data(CSV_PEER_FILE)
     if df_peerids is not None and not df_peerids.empty:
-        z_peerids, bytes_peerids, p_peerids = plot_regression(df_peerids, 'PeerIDs', args.peerids_forecast)
-        print_stats(df_peerids, z_peerids, bytes_peerids, args.peerids_forecast, 'PEERIDS', p_peerids)
+        z_peerids, bytes_peerids, p_peerids, r2_peerids = plot_regression(df_peerids, 'PeerIDs', args.peerids_forecast)
+        print_stats(df_peerids, z_peerids, bytes_peerids, args.peerids_forecast, 'PEERIDS', p_peerids, r2_peerids)
         plt.savefig('peerids_regression.png', dpi=300, bbox_inches='tight')
         plt.draw()
         plt.pause(0.1)